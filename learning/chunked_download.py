@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+## Downloads a file with several parallel HTTP Range requests.
+## Progress is kept in a .part.json file next to the .part file, so a cancelled
+## or crashed download continues where it stopped.
+## Works with any HTTP server that supports Range requests (YouTube's stream urls
+## do, so does a small local test server), and falls back to a single plain GET
+
+CHUNK_SIZE = 1024 * 1024
+READ_SIZE = 64 * 1024
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class ChunkedDownload:
+    def __init__(self, url, path, total_size = None, workers = 4, chunk_size = CHUNK_SIZE, cancel_event = None):
+        self.url = url
+        self.path = path
+        self.part_path = path + ".part"
+        self.state_path = path + ".part.json"
+        self.total_size = total_size
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cancel_event = cancel_event or threading.Event()
+
+        # Read by the UI thread to show progress, written by the download threads
+        self.bytes_done = 0
+        self._lock = threading.Lock()
+        self._done_chunks = set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _open(self, start = None, end = None):
+        request = urllib.request.Request(self.url)
+        if start is not None:
+            request.add_header("Range", f"bytes={start}-{end}")
+        return urllib.request.urlopen(request, timeout = 30)
+
+    def _probe(self):
+        # Ask for the first byte only: the Content-Range header tells us the size
+        # and whether the server supports ranges at all
+        with self._open(0, 0) as response:
+            content_range = response.headers.get("Content-Range")
+            if response.status == 206 and content_range:
+                return int(content_range.split("/")[-1]), True
+            length = response.headers.get("Content-Length")
+            return (int(length) if length else None), False
+
+    def _load_state(self):
+        if os.path.exists(self.part_path) and os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get("size") == self.total_size and state.get("chunk_size") == self.chunk_size:
+                return set(state["done"])
+        return set()
+
+    def _save_state(self):
+        # Called with self._lock held
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"size": self.total_size, "chunk_size": self.chunk_size, "done": sorted(self._done_chunks)}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _fetch_chunk(self, index):
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.total_size) - 1
+        if self.cancel_event.is_set():
+            raise DownloadCancelled()
+
+        with self._open(start, end) as response:
+            # A server that ignores the Range header sends the whole file with 200;
+            # writing that at `start` would overwrite chunks that are already done
+            content_range = response.headers.get("Content-Range") or ""
+            if response.status != 206 or not content_range.startswith(f"bytes {start}-"):
+                raise IOError(f"Chunk {index}: expected 206 for bytes {start}-{end}, "
+                              f"got {response.status} {content_range!r}")
+
+            received = 0
+            size = end - start + 1
+            with open(self.part_path, "r+b") as f:
+                f.seek(start)
+                while received < size:
+                    if self.cancel_event.is_set():
+                        # Throw away the half chunk, it is downloaded again on resume
+                        with self._lock:
+                            self.bytes_done -= received
+                        raise DownloadCancelled()
+                    # Never read past the chunk, so a too-long body can't spill into the next one
+                    data = response.read(min(READ_SIZE, size - received))
+                    if not data:
+                        break
+                    f.write(data)
+                    received += len(data)
+                    with self._lock:
+                        self.bytes_done += len(data)
+
+        if received != size:
+            with self._lock:
+                self.bytes_done -= received
+            raise IOError(f"Chunk {index} incomplete: got {received} of {size} bytes")
+
+        with self._lock:
+            self._done_chunks.add(index)
+            self._save_state()
+
+    def _download_whole(self):
+        # Fallback for servers without Range support: one stream, no resume
+        with self._open() as response, open(self.part_path, "wb") as f:
+            while True:
+                if self.cancel_event.is_set():
+                    raise DownloadCancelled()
+                data = response.read(READ_SIZE)
+                if not data:
+                    break
+                f.write(data)
+                with self._lock:
+                    self.bytes_done += len(data)
+
+    def run(self):
+        size, ranges = self._probe()
+        if self.total_size is None:
+            self.total_size = size
+
+        if not ranges or not self.total_size:
+            self._download_whole()
+        else:
+            self._done_chunks = self._load_state()
+            if not self._done_chunks:
+                with open(self.part_path, "wb") as f:
+                    f.truncate(self.total_size)
+
+            chunk_count = (self.total_size + self.chunk_size - 1) // self.chunk_size
+            todo = [i for i in range(chunk_count) if i not in self._done_chunks]
+            self.bytes_done = sum(min(self.chunk_size, self.total_size - i * self.chunk_size) for i in self._done_chunks)
+
+            with ThreadPoolExecutor(max_workers = self.workers) as executor:
+                futures = [executor.submit(self._fetch_chunk, i) for i in todo]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception:
+                    # Stop the other chunks right away instead of finishing the whole file
+                    # first; finished chunks are kept in .part.json for a retry
+                    self.cancel_event.set()
+                    raise
+
+        os.replace(self.part_path, self.path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.path
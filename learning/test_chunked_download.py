@@ -0,0 +1,123 @@
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from chunked_download import ChunkedDownload, DownloadCancelled
+
+## Runs ChunkedDownload against a small local HTTP server:  python -m pytest learning
+
+CHUNK = 64 * 1024
+DATA = os.urandom(10 * CHUNK + 123)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    # Set per test through the `server` fixture
+    ranges = True           # honour Range headers
+    ranges_after_probe = True
+    on_chunk = None         # called with the start offset of every ranged request
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        is_probe = header == "bytes=0-0"
+        if header and self.ranges and (is_probe or self.ranges_after_probe):
+            start, end = (int(x) for x in header.split("=")[1].split("-"))
+            if self.on_chunk is not None and not is_probe:
+                self.on_chunk(start)
+            body = DATA[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+        else:
+            body = DATA
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def server():
+    handler = type("TestHandler", (Handler,), {})
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target = httpd.serve_forever, daemon = True)
+    thread.start()
+    yield handler, f"http://127.0.0.1:{httpd.server_port}/video.mp4"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_parallel_download(server, tmp_path):
+    _, url = server
+    path = str(tmp_path / "video.mp4")
+
+    ChunkedDownload(url, path, workers = 4, chunk_size = CHUNK).run()
+
+    assert read(path) == DATA
+    assert not os.path.exists(path + ".part")
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_cancel_and_resume(server, tmp_path):
+    handler, url = server
+    path = str(tmp_path / "video.mp4")
+    cancel_event = threading.Event()
+    handler.on_chunk = staticmethod(lambda start: start >= 5 * CHUNK and cancel_event.set())
+
+    with pytest.raises(DownloadCancelled):
+        ChunkedDownload(url, path, workers = 1, chunk_size = CHUNK, cancel_event = cancel_event).run()
+    with open(path + ".part.json") as f:
+        done = json.load(f)["done"]
+    assert 0 < len(done) < 11
+
+    requested = []
+    handler.on_chunk = staticmethod(requested.append)
+    ChunkedDownload(url, path, workers = 4, chunk_size = CHUNK).run()
+
+    assert read(path) == DATA
+    assert not set(start // CHUNK for start in requested) & set(done)
+
+
+def test_fallback_without_range_support(server, tmp_path):
+    handler, url = server
+    handler.ranges = False
+    path = str(tmp_path / "video.mp4")
+
+    ChunkedDownload(url, path, workers = 4, chunk_size = CHUNK).run()
+
+    assert read(path) == DATA
+
+
+def test_full_body_for_a_range_request_is_rejected(server, tmp_path):
+    handler, url = server
+    path = str(tmp_path / "video.mp4")
+
+    # Resume state: every chunk but chunk 1 is already done
+    chunk_count = (len(DATA) + CHUNK - 1) // CHUNK
+    done = [i for i in range(chunk_count) if i != 1]
+    with open(path + ".part", "wb") as f:
+        f.write(DATA[:CHUNK] + bytes(CHUNK) + DATA[2 * CHUNK:])
+    with open(path + ".part.json", "w") as f:
+        json.dump({"size": len(DATA), "chunk_size": CHUNK, "done": done}, f)
+
+    # The server answers the probe with 206 but the chunk itself with 200 + the whole file
+    handler.ranges_after_probe = False
+    with pytest.raises(IOError):
+        ChunkedDownload(url, path, workers = 4, chunk_size = CHUNK).run()
+
+    part = read(path + ".part")
+    assert len(part) == len(DATA)
+    for index in done:
+        assert part[index * CHUNK:(index + 1) * CHUNK] == DATA[index * CHUNK:(index + 1) * CHUNK]
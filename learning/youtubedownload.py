@@ -1,53 +1,114 @@
 import tkinter
 import customtkinter
 import math
+import queue
+import threading
 import pandas as pd
 from pytube import YouTube
 from tkinter import messagebox
 from tkinter.messagebox import askyesno
+from chunked_download import ChunkedDownload, DownloadCancelled
 
 ## https://www.youtube.com/watch?v=-0c7MhcsdlA
 ## Exit button
 ## Cancel button
 ## Show video name and video length and upload time
 
+## Downloads run on a background thread, one link after the other from download_queue.
+## The worker never touches the widgets: it puts functions into ui_events and the
+## main thread runs them (and reads the progress) in pollProgress every 100 ms.
+
+PROGRESS_INTERVAL_MS = 100
+
+download_queue = queue.Queue()
+ui_events = queue.Queue()
+current = {"download": None, "thread": None, "cancel": None}
+
 def startDownload():
-    try:
-        ytLink = link.get()        
-        ytObject = YouTube(ytLink, on_progress_callback = on_progress)
-        video = ytObject.streams.get_highest_resolution()
-
-        video_title.configure(text = ytObject.title)
-        video_length.configure(text = str(math.floor(ytObject.length / 60)) + ":" + str((ytObject.length % 60)))
-        video_uploaded.configure(text = str(ytObject.publish_date)[0:10])
-
-        video.download()
-    except:
-        warning = messagebox.showwarning(title = "Warning", message = "The URL is invalid")
-
-def on_progress(stream, chunks, bytes_remaining):
-    total_size = stream.filesize
-    bytes_downloaded = total_size - bytes_remaining
-    completion = bytes_downloaded / total_size * 100
-    per = str(int(completion))
-    
-    # Update percentage
-    pPercentage.configure(text = per + "%")
-    pPercentage.update()
-
-    # Update proress bar
-    progressBar.set(float(completion) / 100)
+    # Several links can be given at once, separated by spaces or commas
+    links = link.get().replace(",", " ").split()
+    for ytLink in links:
+        download_queue.put(ytLink)
+    link.delete(0, "end")
+
+    if current["thread"] is None:
+        current["thread"] = threading.Thread(target = downloadWorker, daemon = True)
+        current["thread"].start()
+
+def downloadWorker():
+    while True:
+        ytLink = download_queue.get()
+        # Created before the video is looked up, so a Cancel during the lookup isn't lost
+        cancel_event = threading.Event()
+        current["cancel"] = cancel_event
+
+        try:
+            ytObject = YouTube(ytLink)
+            video = ytObject.streams.get_highest_resolution()
+        except Exception as e:
+            ui_events.put(lambda l = ytLink, err = e: showError("Could not load " + l, err))
+            continue
+        if cancel_event.is_set():
+            ui_events.put(lambda: status.configure(text = "Download cancelled"))
+            continue
+        ui_events.put(lambda yt = ytObject: showDetails(yt))
+
+        try:
+            download = ChunkedDownload(video.url, video.default_filename, total_size = video.filesize, cancel_event = cancel_event)
+            current["download"] = download
+            download.run()
+            ui_events.put(lambda name = video.default_filename: status.configure(text = "Finished: " + name))
+        except DownloadCancelled:
+            ui_events.put(lambda: status.configure(text = "Download cancelled"))
+        except Exception as e:
+            ui_events.put(lambda name = video.default_filename, err = e: showError("Download of " + name + " failed", err))
+        finally:
+            current["download"] = None
+
+def showError(message, error):
+    status.configure(text = message)
+    messagebox.showwarning(title = "Warning", message = message + ":\n" + (str(error) or type(error).__name__))
+
+def showDetails(ytObject):
+    video_title.configure(text = ytObject.title)
+    video_length.configure(text = str(math.floor(ytObject.length / 60)) + ":" + str((ytObject.length % 60)))
+    video_uploaded.configure(text = str(ytObject.publish_date)[0:10])
+    status.configure(text = "Downloading...")
+    pPercentage.configure(text = "0%")
+    progressBar.set(0)
+
+def pollProgress():
+    while True:
+        try:
+            ui_events.get_nowait()()
+        except queue.Empty:
+            break
+
+    download = current["download"]
+    if download is not None and download.total_size:
+        completion = download.bytes_done / download.total_size * 100
+        per = str(int(completion))
+
+        # Update percentage
+        pPercentage.configure(text = per + "%")
+
+        # Update proress bar
+        progressBar.set(float(completion) / 100)
+
+    queued.configure(text = "Queued: " + str(download_queue.qsize()))
+    app.after(PROGRESS_INTERVAL_MS, pollProgress)
 
 def cancelDownload():
-    try:
-        ytLink = link.get()
-    except:
-        ytLink = link.get()
+    # Stops the current download (or the lookup before it); the .part file is kept so it can be resumed later
+    cancel_event = current["cancel"]
+    if cancel_event is not None:
+        cancel_event.set()
 
 def confirmExit():
     answer = askyesno(title = "Confirmation", message = "Are you sure you want to quit?")
 
     if answer:
+        cancelDownload()
         app.destroy()
 
 # System settings
@@ -105,5 +166,13 @@ video_uploaded_label.grid(row = 7, column = 0, padx = 10, pady = 10, sticky = "e
 video_uploaded = customtkinter.CTkLabel(app, text = "")
 video_uploaded.grid(row = 7, column = 1, padx = 10, pady = 10, sticky = "ew")
 
+# Download status and queue
+status = customtkinter.CTkLabel(app, text = "")
+status.grid(row = 8, column = 1, padx = 10, pady = 10, sticky = "ew")
+
+queued = customtkinter.CTkLabel(app, text = "Queued: 0")
+queued.grid(row = 8, column = 2, padx = 10, pady = 10, sticky = "ew")
+
 # Run app
+app.after(PROGRESS_INTERVAL_MS, pollProgress)
 app.mainloop()
\ No newline at end of file
@@ -1,65 +1,126 @@
+import threading
 import pandas as pd
-from binance.client import Client
+
+from binance_client_factory import get_client
+from kline_downloader import DownloadCancelled, KlineDownloader
+from metrics import compute_metrics, equity_curve, format_metrics, periods_per_year, round_trip_pnls
+from trade_records import BUY
 
 class Backtester:
-    def __init__(self, append_callback, api_key, api_secret, csv_filename="backtest_results.csv"):
+    def __init__(self, append_callback, api_key, api_secret, csv_filename="backtest_results.csv",
+                 progress_callback=None, downloader=None):
         self.append_callback = append_callback
-        self.client = Client(api_key, api_secret)
+        self.progress_callback = progress_callback
+        self.client = get_client(api_key, api_secret)
+        self.downloader = downloader or KlineDownloader(self.client)
         self.csv_filename = csv_filename
+        self._cancel_event = threading.Event()
+        self.metrics = {}
+
+    def reset(self):
+        """Clear a previous cancel; call before starting a new run (not from the worker thread)."""
+        self._cancel_event.clear()
+
+    def cancel(self):
+        """Ask a running backtest to stop; also interrupts a kline download in progress."""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _report_progress(self, done, total, token):
+        if self.progress_callback is not None:
+            self.progress_callback(done, total, token)
+
+    def load_data(self, token, interval="1h", lookback_days=30):
+        """Fetch klines for one token as a DataFrame, or None if nothing was returned."""
+        klines = self.downloader.fetch(token, interval, f"{lookback_days} day ago UTC",
+                                       cancel_event=self._cancel_event)
+        for gap_start, gap_end in self.downloader.gaps.get(token, []):
+            self.append_callback(
+                f"[{token}] Warning: missing bars between "
+                f"{pd.to_datetime(gap_start, unit='ms')} and {pd.to_datetime(gap_end, unit='ms')}\n"
+            )
+
+        if not klines:
+            return None
+
+        data = pd.DataFrame(klines, columns=[
+            "open_time", "open", "high", "low", "close", "volume",
+            "close_time", "quote_asset_volume", "number_of_trades",
+            "taker_buy_base_asset_volume", "taker_buy_quote_asset_volume", "ignore"
+        ])
+        data["close"] = pd.to_numeric(data["close"])
+        return data
 
     def run_strategy(self, token_list, strategy, interval="1h", lookback_days=30):
         self.append_callback("Starting backtest...\n")
 
         all_results = []
+        self.metrics = {}
+        total = len(token_list)
+        self._report_progress(0, total, None)
+
+        for done, token in enumerate(token_list):
+            if self.cancelled:
+                break
 
-        for token in token_list:
             self.append_callback(f"Fetching historical data for {token}...\n")
 
             try:
-                klines = self.client.get_historical_klines(token, interval, f"{lookback_days} day ago UTC")
-
-                if not klines:
+                data = self.load_data(token, interval, lookback_days)
+                if data is None:
                     self.append_callback(f"No data fetched for {token}.\n")
+                    self._report_progress(done + 1, total, token)
                     continue
 
-                data = pd.DataFrame(klines, columns=[
-                    "open_time", "open", "high", "low", "close", "volume",
-                    "close_time", "quote_asset_volume", "number_of_trades",
-                    "taker_buy_base_asset_volume", "taker_buy_quote_asset_volume", "ignore"
-                ])
-                data["close"] = pd.to_numeric(data["close"])
+                trades, _ = strategy.run(data)
 
-                trades = strategy.run(data)
+                results = trades.to_frame()
+                results["timestamp"] = results["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+                results.insert(0, "token", token)
 
-                for trade in trades:
-                    timestamp_str = (
-                        trade["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
-                        if hasattr(trade["timestamp"], "strftime") else trade["timestamp"]
-                    )
-                    all_results.append({
-                        "token": token,
-                        "action": trade["action"],
-                        "price": trade["price"],
-                        "timestamp": timestamp_str,
-                        "balance_before": round(trade["balance_before"],4),
-                        "balance_after": round(trade["balance_after"],4),
-                        "amount": round(trade["amount"],10),
-                    })
-                    self.append_callback(
-                        f"[{token}] {trade['action']} {trade['amount']:.6f} tokens at ${trade['price']:.2f} "
+                lines = []
+                for trade, timestamp_str in zip(trades.records, results["timestamp"]):
+                    if self.cancelled:
+                        break
+                    action = "BUY" if trade["action"] == BUY else "SELL"
+                    lines.append(
+                        f"[{token}] {action} {trade['amount']:.6f} tokens at ${trade['price']:.2f} "
                         f"on {timestamp_str} | Balance before: ${trade['balance_before']:.2f}, after: ${trade['balance_after']:.2f}\n"
                     )
+                if lines:
+                    self.append_callback("".join(lines))
+                all_results.append(results.iloc[:len(lines)])
+
+                if len(trades):
+                    self.append_callback(f"[{token}] Final balance: ${trades.records['balance_after'][-1]:.2f}\n")
 
-                final_balance = trades[-1]["balance_after"] if trades else None
-                if final_balance is not None:
-                    self.append_callback(f"[{token}] Final balance: ${final_balance:.2f}\n")
+                equity, in_position = equity_curve(data, trades)
+                metrics = compute_metrics(equity, in_position, round_trip_pnls(trades),
+                                          periods_per_year=periods_per_year(interval))
+                self.metrics[token] = metrics
+                self.append_callback(f"[{token}] {format_metrics(metrics)}\n")
 
+            except DownloadCancelled:
+                break
             except Exception as e:
                 self.append_callback(f"Error fetching data for {token}: {e}\n")
 
-        if all_results:
-            df_results = pd.DataFrame(all_results)
+            self._report_progress(done + 1, total, token)
+
+        df_results = pd.concat(all_results, ignore_index=True) if all_results else pd.DataFrame()
+        if not df_results.empty:
+            df_results = df_results.round({"balance_before": 4, "balance_after": 4, "amount": 10})
+
+        if not df_results.empty and self.csv_filename:
             df_results.to_csv(self.csv_filename, index=False)
             self.append_callback(f"Backtest results saved to {self.csv_filename}\n")
 
-        self.append_callback("Backtest finished.\n")
\ No newline at end of file
+        if self.cancelled:
+            self.append_callback("Backtest cancelled.\n")
+        else:
+            self.append_callback("Backtest finished.\n")
+
+        return df_results
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+batch_backtest.py
+
+Headless batch backtest runner (no GUI).
+
+Runs every symbol x interval x strategy x parameter set from a JSON job
+file in parallel worker processes and writes consolidated results.
+
+Job file example:
+    {
+        "symbols": ["BTCUSDT", "ETHUSDT"],
+        "intervals": ["1h", "4h"],
+        "lookback_days": 30,
+        "strategies": [
+            {"name": "sma", "params": [{"window": 3}, {"window": 10}]},
+            {"name": "ma_cross", "params": [{"short_window": 5, "long_window": 20}]},
+            {"name": "rules", "params": [{"entry": "ema(close, 9) crosses_above ema(close, 21)",
+                                          "exit": "ema(close, 9) crosses_below ema(close, 21)"}]}
+        ]
+    }
+
+Usage:
+    python batch_backtest.py jobs.json --workers 4 --output-dir batch_results
+
+All workers together stay under --weight-per-minute of Binance request
+weight: each worker's downloader gets an equal share of it.
+
+Exit status: 0 = all jobs ok, 1 = some jobs failed, 2 = invalid job file.
+A one-line JSON status summary is printed to stdout.
+
+Only the standard library is imported at module level; the strategies
+are imported to validate the job file, pandas and the Binance client
+only inside the workers.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+EXIT_OK = 0
+EXIT_JOBS_FAILED = 1
+EXIT_BAD_JOB_FILE = 2
+
+# Binance's default per-IP request weight limit
+WEIGHT_PER_MINUTE = 1200
+MAX_DOWNLOAD_THREADS = 8
+
+TRADE_COLUMNS = [
+    "token", "interval", "strategy", "params", "action", "price", "timestamp",
+    "balance_before", "balance_after", "amount"
+]
+METRIC_COLUMNS = ["total_return", "sharpe", "sortino", "max_drawdown", "win_rate", "exposure"]
+SUMMARY_COLUMNS = [
+    "token", "interval", "strategy", "params", "status", "trades", "final_balance"
+] + METRIC_COLUMNS + ["error"]
+
+
+def load_jobs(path):
+    """
+    Expand a job file into tasks grouped by (symbol, interval), so each
+    worker downloads the data once and runs all strategy variants on it.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+
+    symbols = spec.get("symbols")
+    strategies = spec.get("strategies")
+    if not symbols or not strategies:
+        raise ValueError("Job file needs non-empty 'symbols' and 'strategies'")
+    intervals = spec.get("intervals", ["1h"])
+    lookback_days = spec.get("lookback_days", 30)
+
+    variants = []
+    for entry in strategies:
+        if not isinstance(entry, dict) or "name" not in entry:
+            raise ValueError(f"Strategy entry without 'name': {entry}")
+        params_list = entry.get("params", [{}])
+        if not isinstance(params_list, list):
+            raise ValueError(f"'params' of {entry['name']!r} must be a list of objects")
+        for params in params_list:
+            if not isinstance(params, dict):
+                raise ValueError(f"Parameter set of {entry['name']!r} is not an object: {params!r}")
+            variants.append((entry["name"], params))
+
+    return [
+        {"symbol": symbol, "interval": interval, "lookback_days": lookback_days, "variants": variants}
+        for symbol in symbols
+        for interval in intervals
+    ]
+
+
+def validate_variants(tasks):
+    """Build every strategy variant once, so bad names or params fail before any download."""
+    from strategies import STRATEGIES
+
+    for name, params in tasks[0]["variants"] if tasks else []:
+        if name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {name!r} (available: {', '.join(sorted(STRATEGIES))})")
+        try:
+            STRATEGIES[name](**params)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid params for {name!r} {json.dumps(params, sort_keys=True)}: {e}")
+
+
+def run_task(task, api_key, api_secret, weight_per_minute=WEIGHT_PER_MINUTE, download_threads=MAX_DOWNLOAD_THREADS):
+    # Heavy imports are deferred to the worker so the CLI itself starts instantly.
+    from backtest import Backtester
+    from binance_client_factory import get_client
+    from kline_downloader import KlineDownloader
+    from metrics import compute_metrics, equity_curve, periods_per_year, round_trip_pnls
+    from strategies import STRATEGIES
+
+    warnings = []
+    downloader = KlineDownloader(get_client(api_key, api_secret), max_workers=download_threads,
+                                 weight_per_minute=weight_per_minute)
+    backtester = Backtester(warnings.append, api_key, api_secret, csv_filename=None, downloader=downloader)
+    symbol, interval = task["symbol"], task["interval"]
+    trades_out, summary = [], []
+
+    try:
+        data = backtester.load_data(symbol, interval, task["lookback_days"])
+    except Exception as e:
+        data, load_error = None, f"Error fetching data: {e}"
+    else:
+        load_error = None if data is not None else "No data fetched"
+
+    for name, params in task["variants"]:
+        params_str = json.dumps(params, sort_keys=True)
+        row = {"token": symbol, "interval": interval, "strategy": name, "params": params_str,
+               "status": "ok", "trades": 0, "final_balance": "", "error": ""}
+        try:
+            if load_error:
+                raise RuntimeError(load_error)
+            strategy = STRATEGIES[name](**params)
+            trades, final_balance = strategy.run(data.copy())
+            row["trades"] = len(trades)
+            row["final_balance"] = round(final_balance, 4)
+            equity, in_position = equity_curve(data, trades)
+            metrics = compute_metrics(equity, in_position, round_trip_pnls(trades),
+                                      periods_per_year=periods_per_year(interval))
+            row.update({column: round(metrics[column], 6) for column in METRIC_COLUMNS})
+            if len(trades):
+                frame = trades.to_frame().round({"balance_before": 4, "balance_after": 4, "amount": 10})
+                for i, (column, value) in enumerate([("token", symbol), ("interval", interval),
+                                                     ("strategy", name), ("params", params_str)]):
+                    frame.insert(i, column, value)
+                trades_out.append(frame.to_csv(header=False, index=False,
+                                               date_format="%Y-%m-%d %H:%M:%S"))
+        except Exception as e:
+            row["status"] = "error"
+            row["error"] = f"{type(e).__name__}: {e}"
+        summary.append(row)
+
+    # Trades come back as ready-made CSV text (no header) to keep pickling cheap.
+    return "".join(trades_out), summary, warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a batch of backtests without the GUI.")
+    parser.add_argument("job_file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output-dir", default="batch_results")
+    parser.add_argument("--weight-per-minute", type=int, default=WEIGHT_PER_MINUTE,
+                        help="Binance request weight per minute shared by all workers")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    try:
+        tasks = load_jobs(args.job_file)
+        validate_variants(tasks)
+    except (OSError, ValueError) as e:
+        print(json.dumps({"status": "invalid_job_file", "error": str(e)}))
+        return EXIT_BAD_JOB_FILE
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    # Klines are public data, so keys are optional for backtesting.
+    api_key = os.getenv("BINANCE_API_KEY")
+    api_secret = os.getenv("BINANCE_API_SECRET")
+
+    # Every worker process has its own downloader and budget, so split the limit between them
+    workers = max(1, min(args.workers or 1, len(tasks)))
+    weight_per_worker = max(1, args.weight_per_minute // workers)
+    threads_per_worker = max(1, MAX_DOWNLOAD_THREADS // workers)
+
+    all_trades, all_summary = [], []
+    trade_count = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_task, task, api_key, api_secret, weight_per_worker, threads_per_worker)
+                   for task in tasks]
+        for task, future in zip(tasks, futures):
+            try:
+                trades, summary, warnings = future.result()
+            except Exception as e:
+                summary = [{"token": task["symbol"], "interval": task["interval"], "strategy": name,
+                            "params": json.dumps(params, sort_keys=True), "status": "error",
+                            "trades": 0, "final_balance": "", "error": f"Worker failed: {e}"}
+                           for name, params in task["variants"]]
+                trades, warnings = "", []
+            all_trades.append(trades)
+            trade_count += trades.count("\n")
+            all_summary.extend(summary)
+            for warning in warnings:
+                print(warning, end="", file=sys.stderr)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    trades_path = os.path.join(args.output_dir, "trades.csv")
+    summary_path = os.path.join(args.output_dir, "summary.csv")
+    with open(trades_path, "w", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerow(TRADE_COLUMNS)
+        f.writelines(all_trades)
+    with open(summary_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(all_summary)
+
+    failed = sum(1 for row in all_summary if row["status"] != "ok")
+    print(json.dumps({
+        "status": "ok" if failed == 0 else "jobs_failed",
+        "jobs": len(all_summary),
+        "failed": failed,
+        "trades": trade_count,
+        "seconds": round(time.time() - started, 2),
+        "summary_csv": summary_path,
+        "trades_csv": trades_path,
+    }))
+    return EXIT_OK if failed == 0 else EXIT_JOBS_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,8 @@
-from binance.client import Client
+from binance_client_factory import get_client
 
 class BinanceClient:
     def __init__(self, api_key, api_secret):
-        self.client = Client(api_key, api_secret)
+        self.client = get_client(api_key, api_secret)
 
     def get_live_prices(self, token_list):
         """
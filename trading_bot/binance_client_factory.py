@@ -0,0 +1,99 @@
+"""
+binance_client_factory.py
+
+One shared python-binance Client per (api_key, api_secret, testnet),
+used by Backtester, BinanceClient and BinanceWrapper alike.
+
+- Created lazily and thread-safely on first use, without the blocking
+  ping() that Client() normally does in its constructor
+- Its requests session gets a larger connection pool, TCP keep-alive on
+  idle connections, retries for idempotent GETs and a default timeout
+- The server clock offset used to sign requests is fetched once and
+  cached for CLOCK_OFFSET_TTL_SECONDS instead of being re-checked
+
+Tunables (environment variables):
+    BINANCE_POOL_SIZE            connections kept per host (default 10)
+    BINANCE_KEEPALIVE_IDLE       seconds idle before TCP keep-alive probes (default 60)
+    BINANCE_REQUEST_TIMEOUT      seconds per request (default 10)
+    BINANCE_CLOCK_OFFSET_TTL     seconds the clock offset is trusted (default 3600)
+"""
+
+import os
+import socket
+import threading
+import time
+
+from binance.client import Client
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+TESTNET_API_URL = 'https://testnet.binance.vision/api'
+
+POOL_SIZE = int(os.getenv("BINANCE_POOL_SIZE", "10"))
+KEEPALIVE_IDLE_SECONDS = int(os.getenv("BINANCE_KEEPALIVE_IDLE", "60"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("BINANCE_REQUEST_TIMEOUT", "10"))
+CLOCK_OFFSET_TTL_SECONDS = float(os.getenv("BINANCE_CLOCK_OFFSET_TTL", "3600"))
+
+_clients = {}
+_clock_offsets = {}  # API_URL -> (offset_ms, fetched_at)
+_lock = threading.Lock()
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets send TCP keep-alive probes when idle."""
+    def init_poolmanager(self, *args, **kwargs):
+        options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE_SECONDS))
+        elif hasattr(socket, "TCP_KEEPALIVE"):  # macOS
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, KEEPALIVE_IDLE_SECONDS))
+        kwargs["socket_options"] = options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _create_client(api_key, api_secret, testnet):
+    client = Client(api_key, api_secret, requests_params={"timeout": REQUEST_TIMEOUT_SECONDS}, ping=False)
+    if testnet:
+        client.API_URL = TESTNET_API_URL
+
+    adapter = KeepAliveAdapter(
+        pool_connections=POOL_SIZE,
+        pool_maxsize=POOL_SIZE,
+        # Orders are POSTs and must never be retried blindly; only GETs are
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                          allowed_methods=frozenset(["GET"])),
+    )
+    client.session.mount("https://", adapter)
+    client.session.headers["Connection"] = "keep-alive"
+    return client
+
+
+def get_client(api_key, api_secret, testnet=False):
+    key = (api_key, api_secret, testnet)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _create_client(api_key, api_secret, testnet)
+                _clients[key] = client
+    return client
+
+
+def sync_clock_offset(client, force=False):
+    """
+    Set client.timestamp_offset (server time - local time, used to sign
+    requests) from a cached value, asking the server only when the cached
+    value is older than CLOCK_OFFSET_TTL_SECONDS.
+    """
+    cached = _clock_offsets.get(client.API_URL)
+    if cached is None or force or time.monotonic() - cached[1] > CLOCK_OFFSET_TTL_SECONDS:
+        local_before = time.time() * 1000
+        server_time = client.get_server_time()["serverTime"]
+        local_after = time.time() * 1000
+        offset = int(server_time - (local_before + local_after) / 2)
+        cached = (offset, time.monotonic())
+        _clock_offsets[client.API_URL] = cached
+    client.timestamp_offset = cached[0]
+    return cached[0]
@@ -0,0 +1,273 @@
+"""
+exchange_simulator.py
+
+In-process stand-in for BinanceWrapper that replays stored klines on a
+virtual clock, so LiveTradingBot.run can be exercised end-to-end without
+the testnet and without waiting POLL_INTERVAL_SECONDS per tick.
+
+Supports:
+- klines (only bars closed at the current virtual time are visible)
+- tickers (last close per symbol)
+- balances per asset
+- market orders filled at the current price, with optional fee/slippage
+- exchangeInfo style LOT_SIZE / NOTIONAL filters
+
+Usage:
+    python exchange_simulator.py BTCUSDT=btc_1m.csv ETHUSDT=eth_1m.csv --usdt 1000
+"""
+
+import argparse
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from binance.exceptions import BinanceOrderException
+
+from live_trading_bot import BinanceWrapper, LiveTradingBot, logger
+from strategies import SimpleSmaStrategy, MovingAverageCrossStrategy
+
+KLINE_COLUMNS = [
+    "open_time", "open", "high", "low", "close", "volume",
+    "close_time", "quote_asset_volume", "number_of_trades",
+    "taker_buy_base_asset_volume", "taker_buy_quote_asset_volume", "ignore"
+]
+
+
+def default_symbol_info(symbol, quote_asset="USDT", step_size="0.00001000",
+                        min_qty="0.00001000", min_notional="5.00000000"):
+    return {
+        "symbol": symbol,
+        "status": "TRADING",
+        "baseAsset": symbol[:-len(quote_asset)] if symbol.endswith(quote_asset) else symbol,
+        "quoteAsset": quote_asset,
+        "filters": [
+            {"filterType": "PRICE_FILTER", "minPrice": "0.01000000", "maxPrice": "1000000.00000000",
+             "tickSize": "0.01000000"},
+            {"filterType": "LOT_SIZE", "minQty": min_qty, "maxQty": "9000.00000000", "stepSize": step_size},
+            {"filterType": "NOTIONAL", "minNotional": min_notional, "applyMinToMarket": True},
+        ],
+    }
+
+
+class SimulatedExchange(BinanceWrapper):
+    """
+    Replays historical klines for a set of symbols.
+
+    `klines` maps symbol -> DataFrame (or raw list) in the Binance kline
+    layout. The virtual clock starts once `warmup_bars` bars are available
+    for every symbol and is only advanced by sleep().
+    """
+    def __init__(self, klines, balances=None, symbol_info=None, fee_rate=0.0,
+                 slippage_pct=0.0, warmup_bars=100, start_time_ms=None):
+        self.client = None
+        self._symbol_info = {}
+        self.fee_rate = fee_rate
+        self.slippage_pct = slippage_pct
+        self.balances = {"USDT": 1000.0}
+        if balances:
+            self.balances.update({asset: float(v) for asset, v in balances.items()})
+        self.orders = []
+        self._next_order_id = 1
+
+        self._frames = {}
+        self._close_times = {}
+        self._closes = {}
+        for symbol, raw in klines.items():
+            df = raw if isinstance(raw, pd.DataFrame) else pd.DataFrame(raw, columns=KLINE_COLUMNS)
+            df = df.sort_values("close_time").reset_index(drop=True)
+            close_time_ms = pd.to_numeric(df["close_time"]).to_numpy(dtype=np.int64)
+            for col in ["open", "high", "low", "close", "volume"]:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            df["close_time"] = pd.to_datetime(close_time_ms, unit='ms')
+            df["open_time"] = pd.to_datetime(pd.to_numeric(df["open_time"]), unit='ms')
+            # copy() consolidates the column blocks once; otherwise every per-tick
+            # slice copy in get_klines_df pays for consolidating them again
+            self._frames[symbol] = df.copy()
+            self._close_times[symbol] = close_time_ms
+            self._closes[symbol] = df["close"].to_numpy(dtype=np.float64)
+
+            info = (symbol_info or {}).get(symbol) or default_symbol_info(symbol)
+            self._symbol_info[symbol] = info
+
+        if not self._frames:
+            raise ValueError("SimulatedExchange needs klines for at least one symbol")
+
+        first_ready = max(
+            times[min(warmup_bars, len(times)) - 1] for times in self._close_times.values()
+        )
+        self.start_time_ms = int(start_time_ms if start_time_ms is not None else first_ready)
+        self.end_time_ms = int(min(times[-1] for times in self._close_times.values()))
+        self.now_ms = self.start_time_ms
+
+    @classmethod
+    def from_csv(cls, csv_paths, **kwargs):
+        """`csv_paths` maps symbol -> CSV file with KLINE_COLUMNS headers."""
+        return cls({symbol: pd.read_csv(path) for symbol, path in csv_paths.items()}, **kwargs)
+
+    # --- Virtual clock ---
+    def now(self):
+        return datetime.fromtimestamp(self.now_ms / 1000, tz=timezone.utc)
+
+    def sleep(self, seconds):
+        self.now_ms += int(seconds * 1000)
+
+    @property
+    def finished(self):
+        return self.now_ms > self.end_time_ms
+
+    def ticks_until_end(self, poll_interval):
+        """Number of poll_interval ticks that fit between the current time and the end of data."""
+        if self.finished:
+            return 0
+        return (self.end_time_ms - self.now_ms) // int(poll_interval * 1000) + 1
+
+    def _visible_bars(self, symbol):
+        return int(np.searchsorted(self._close_times[symbol], self.now_ms, side="right"))
+
+    # --- BinanceWrapper surface ---
+    def check_connectivity(self):
+        return True
+
+    def get_klines_df(self, symbol, interval="1m", limit=100):
+        # `interval` is whatever the stored klines were recorded at.
+        if symbol not in self._frames:
+            return pd.DataFrame()
+        end = self._visible_bars(symbol)
+        if end == 0:
+            return pd.DataFrame()
+        return self._frames[symbol].iloc[max(0, end - limit):end].copy()
+
+    def get_price(self, symbol):
+        end = self._visible_bars(symbol)
+        if end == 0:
+            return None
+        return float(self._closes[symbol][end - 1])
+
+    def get_all_tickers(self):
+        tickers = []
+        for symbol in self._frames:
+            price = self.get_price(symbol)
+            if price is not None:
+                tickers.append({"symbol": symbol, "price": f"{price:.8f}"})
+        return tickers
+
+    def get_symbol_info(self, symbol):
+        return self._symbol_info.get(symbol)
+
+    def get_asset_free(self, asset):
+        return self.balances.get(asset, 0.0)
+
+    def _filter(self, info, filter_type):
+        for f in info.get("filters", []):
+            if f["filterType"] == filter_type:
+                return f
+        return None
+
+    def _reject(self, message):
+        raise BinanceOrderException(-2010, message)
+
+    def _market_order(self, symbol, side, quantity):
+        info = self.get_symbol_info(symbol)
+        if not info:
+            self._reject(f"Invalid symbol {symbol}")
+        price = self.get_price(symbol)
+        if price is None:
+            self._reject(f"No market data for {symbol} yet")
+
+        quantity = float(quantity)
+        lot = self._filter(info, "LOT_SIZE")
+        if lot:
+            step = float(lot["stepSize"])
+            if quantity < float(lot["minQty"]) or quantity > float(lot["maxQty"]):
+                self._reject("Filter failure: LOT_SIZE")
+            if step > 0 and abs(round(quantity / step) * step - quantity) > step * 1e-6:
+                self._reject("Filter failure: LOT_SIZE")
+
+        notional = self._filter(info, "NOTIONAL") or self._filter(info, "MIN_NOTIONAL")
+        if notional and quantity * price < float(notional["minNotional"]):
+            self._reject("Filter failure: NOTIONAL")
+
+        base, quote = info["baseAsset"], info["quoteAsset"]
+        if side == "BUY":
+            fill_price = price * (1 + self.slippage_pct)
+            cost = quantity * fill_price
+            if cost > self.get_asset_free(quote):
+                self._reject("Account has insufficient balance for requested action.")
+            commission = quantity * self.fee_rate
+            commission_asset = base
+            self.balances[quote] = self.get_asset_free(quote) - cost
+            self.balances[base] = self.get_asset_free(base) + quantity - commission
+        else:
+            fill_price = price * (1 - self.slippage_pct)
+            if quantity > self.get_asset_free(base) + 1e-12:
+                self._reject("Account has insufficient balance for requested action.")
+            proceeds = quantity * fill_price
+            commission = proceeds * self.fee_rate
+            commission_asset = quote
+            self.balances[base] = self.get_asset_free(base) - quantity
+            self.balances[quote] = self.get_asset_free(quote) + proceeds - commission
+
+        order = {
+            "symbol": symbol,
+            "orderId": self._next_order_id,
+            "transactTime": self.now_ms,
+            "side": side,
+            "type": "MARKET",
+            "status": "FILLED",
+            "origQty": f"{quantity:.8f}",
+            "executedQty": f"{quantity:.8f}",
+            "cummulativeQuoteQty": f"{quantity * fill_price:.8f}",
+            "fills": [{
+                "price": f"{fill_price:.8f}",
+                "qty": f"{quantity:.8f}",
+                "commission": f"{commission:.8f}",
+                "commissionAsset": commission_asset,
+            }],
+        }
+        self._next_order_id += 1
+        self.orders.append(order)
+        return order
+
+    def market_buy(self, symbol, quantity):
+        return self._market_order(symbol, "BUY", quantity)
+
+    def market_sell(self, symbol, quantity):
+        return self._market_order(symbol, "SELL", quantity)
+
+
+def replay(bot, exchange):
+    """
+    Run `bot` against `exchange` until the stored klines run out. The trade
+    log (and its metrics checkpoint) is emptied first, so every replay of
+    the same data produces the same log.
+    """
+    if hasattr(bot.trade_logger, "reset"):
+        bot.trade_logger.reset()
+    bot.run(max_ticks=exchange.ticks_until_end(bot.poll_interval))
+    return exchange.balances
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay LiveTradingBot against stored klines.")
+    parser.add_argument("klines", nargs="+", help="SYMBOL=path/to/klines.csv")
+    parser.add_argument("--strategy", choices=["sma", "ma_cross"], default="sma")
+    parser.add_argument("--usdt", type=float, default=1000.0)
+    parser.add_argument("--fee-rate", type=float, default=0.0)
+    parser.add_argument("--trade-log", default="simulated_trade_log.csv")
+    parser.add_argument("--quiet", action="store_true", help="Only log warnings and errors")
+    args = parser.parse_args()
+
+    if args.quiet:
+        logger.setLevel(logging.WARNING)
+
+    csv_paths = dict(item.split("=", 1) for item in args.klines)
+    exchange = SimulatedExchange.from_csv(csv_paths, balances={"USDT": args.usdt}, fee_rate=args.fee_rate)
+    strategy_factory = SimpleSmaStrategy if args.strategy == "sma" else MovingAverageCrossStrategy
+
+    bot = LiveTradingBot(None, None, list(csv_paths), strategy_factory=strategy_factory,
+                         wrapper=exchange, trade_log_csv=args.trade_log,
+                         clock=exchange.now, sleep=exchange.sleep)
+    balances = replay(bot, exchange)
+    print(f"Orders filled: {len(exchange.orders)}")
+    print(f"Final balances: {balances}")
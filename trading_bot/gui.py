@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 import time
+from collections import deque
 from dotenv import load_dotenv
 import os
 
@@ -9,6 +10,48 @@ from backtest import Backtester
 from strategies import SimpleSmaStrategy, MovingAverageCrossStrategy
 from binance_api import BinanceClient  # your wrapper for live prices
 
+class BufferedTextOutput:
+    """
+    Thread-safe output channel for a Text widget.
+    write() only appends to a buffer; the Tk thread drains it every
+    flush_interval_ms with a single insert, and trims the widget to
+    max_lines so long runs don't grow it without bound.
+    """
+    def __init__(self, widget, flush_interval_ms=100, max_lines=5000):
+        self.widget = widget
+        self.flush_interval_ms = flush_interval_ms
+        self.max_lines = max_lines
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._schedule()
+
+    def write(self, text):
+        with self._lock:
+            self._buffer.append(text)
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+        self.widget.delete(1.0, tk.END)
+
+    def _schedule(self):
+        self.widget.after(self.flush_interval_ms, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            chunks = list(self._buffer)
+            self._buffer.clear()
+
+        if chunks:
+            self.widget.insert(tk.END, "".join(chunks))
+            line_count = int(self.widget.index("end-1c").split(".")[0])
+            if line_count > self.max_lines:
+                self.widget.delete(1.0, f"{line_count - self.max_lines + 1}.0")
+            self.widget.see(tk.END)
+
+        self._schedule()
+
+
 class TradingBotGUI(tk.Tk):
     def __init__(self, api_key, api_secret):
         super().__init__()
@@ -23,7 +66,9 @@ class TradingBotGUI(tk.Tk):
 
         self.create_widgets()
 
-        self.backtester = Backtester(self.append_backtest_results, api_key, api_secret)
+        self.backtester = Backtester(self.append_backtest_results, api_key, api_secret,
+                                     progress_callback=self.update_backtest_progress)
+        self.backtest_thread = None
         self.live_price_thread = None
         self.live_price_running = False
 
@@ -42,14 +87,27 @@ class TradingBotGUI(tk.Tk):
         self.strategy_combo.current(0)
         self.strategy_combo.pack(fill="x", padx=10)
 
-        # Backtest button
-        self.backtest_btn = ttk.Button(self, text="Start Backtest", command=self.start_backtest_thread)
-        self.backtest_btn.pack(pady=10)
+        # Backtest buttons frame
+        backtest_btn_frame = ttk.Frame(self)
+        backtest_btn_frame.pack(pady=10)
+
+        self.backtest_btn = ttk.Button(backtest_btn_frame, text="Start Backtest", command=self.start_backtest_thread)
+        self.backtest_btn.grid(row=0, column=0, padx=5)
+
+        self.cancel_backtest_btn = ttk.Button(backtest_btn_frame, text="Cancel Backtest", command=self.cancel_backtest, state="disabled")
+        self.cancel_backtest_btn.grid(row=0, column=1, padx=5)
+
+        # Backtest progress
+        self.backtest_progress_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.backtest_progress_var).pack(anchor="w", padx=10)
+        self.backtest_progress = ttk.Progressbar(self, mode="determinate")
+        self.backtest_progress.pack(fill="x", padx=10, pady=(0,5))
 
         # Backtest output box
         ttk.Label(self, text="Backtest Output:").pack(anchor="w", padx=10)
         self.backtest_output = scrolledtext.ScrolledText(self, height=12)
         self.backtest_output.pack(fill="both", expand=True, padx=10, pady=(0,10))
+        self.backtest_output_buffer = BufferedTextOutput(self.backtest_output)
 
         # Live prices
         ttk.Label(self, text="Live Prices:").pack(anchor="w", padx=10, pady=5)
@@ -67,9 +125,16 @@ class TradingBotGUI(tk.Tk):
         self.stop_live_btn.grid(row=0, column=1, padx=5)
 
     def append_backtest_results(self, text):
+        self.backtest_output_buffer.write(text)
+
+    def update_backtest_progress(self, done, total, token):
         def inner():
-            self.backtest_output.insert(tk.END, text)
-            self.backtest_output.see(tk.END)
+            self.backtest_progress["maximum"] = max(total, 1)
+            self.backtest_progress["value"] = done
+            label = f"{done}/{total} tokens"
+            if token:
+                label += f" (last: {token})"
+            self.backtest_progress_var.set(label)
         self.after(0, inner)
 
     def append_live_prices(self, text):
@@ -79,26 +144,49 @@ class TradingBotGUI(tk.Tk):
         self.after(0, inner)
 
     def start_backtest_thread(self):
-        thread = threading.Thread(target=self.run_backtest)
-        thread.daemon = True
-        thread.start()
+        if self.backtest_thread and self.backtest_thread.is_alive():
+            return
 
-    def run_backtest(self):
         tokens = [t.strip().upper() for t in self.token_entry.get().split(",") if t.strip()]
         if not tokens:
             messagebox.showerror("Error", "Please enter at least one token.")
             return
 
-        strategy_name = self.strategy_var.get()
-        if strategy_name == "Simple SMA Strategy":
-            strategy = SimpleSmaStrategy(window=3)
-        elif strategy_name == "Moving Average Cross Strategy":
-            strategy = MovingAverageCrossStrategy(short_window=5, long_window=20)
-        else:
-            self.append_backtest_results("Unknown strategy selected.\n")
-            return
+        self.backtest_output_buffer.clear()
+        # Reset here rather than in the worker, so a Cancel click right after
+        # Start can't be wiped out by the thread starting late
+        self.backtester.reset()
+        self.backtest_btn.config(state="disabled")
+        self.cancel_backtest_btn.config(state="normal")
+
+        self.backtest_thread = threading.Thread(target=self.run_backtest, args=(tokens,))
+        self.backtest_thread.daemon = True
+        self.backtest_thread.start()
+
+    def cancel_backtest(self):
+        self.backtester.cancel()
+        self.cancel_backtest_btn.config(state="disabled")
+
+    def finish_backtest(self):
+        def inner():
+            self.backtest_btn.config(state="normal")
+            self.cancel_backtest_btn.config(state="disabled")
+        self.after(0, inner)
 
-        self.backtester.run_strategy(tokens, strategy)
+    def run_backtest(self, tokens):
+        try:
+            strategy_name = self.strategy_var.get()
+            if strategy_name == "Simple SMA Strategy":
+                strategy = SimpleSmaStrategy(window=3)
+            elif strategy_name == "Moving Average Cross Strategy":
+                strategy = MovingAverageCrossStrategy(short_window=5, long_window=20)
+            else:
+                self.append_backtest_results("Unknown strategy selected.\n")
+                return
+
+            self.backtester.run_strategy(tokens, strategy)
+        finally:
+            self.finish_backtest()
 
     def start_live_prices(self):
         tokens = [t.strip().upper() for t in self.token_entry.get().split(",") if t.strip()]
@@ -0,0 +1,274 @@
+"""
+kline_downloader.py
+
+Concurrent historical kline downloader.
+
+- Splits the requested range into 1000-bar chunks on a fixed time grid
+- Fetches chunks in parallel under a shared request-weight budget
+- Reassembles chunks in order, drops duplicate bars and reports gaps
+- Caches every completed chunk on disk, so an interrupted (multi-symbol)
+  download resumes where it stopped instead of starting over
+- Monthly ("1M") bars have no fixed length and are paged sequentially instead
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from binance.exceptions import BinanceAPIException
+from binance.helpers import date_to_milliseconds, interval_to_milliseconds
+
+logger = logging.getLogger("kline_downloader")
+
+BARS_PER_REQUEST = 1000
+KLINES_REQUEST_WEIGHT = 2
+DEFAULT_WEIGHT_PER_MINUTE = 1200
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class RequestWeightBudget:
+    """Token bucket shared by all download threads, refilled continuously per minute."""
+    def __init__(self, weight_per_minute=DEFAULT_WEIGHT_PER_MINUTE):
+        self.capacity = weight_per_minute
+        self.available = float(weight_per_minute)
+        self.refill_per_second = weight_per_minute / 60.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, weight, cancel_event=None):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity,
+                                     self.available + (now - self._last_refill) * self.refill_per_second)
+                self._last_refill = now
+                if self.available >= weight:
+                    self.available -= weight
+                    return
+                wait = (weight - self.available) / self.refill_per_second
+            if cancel_event is None:
+                time.sleep(wait)
+            elif cancel_event.wait(wait):
+                raise DownloadCancelled()
+
+    def try_acquire(self, weight):
+        """
+        Non-blocking acquire(): takes the weight and returns 0.0 if it is
+        available, otherwise takes nothing and returns the seconds to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity,
+                                 self.available + (now - self._last_refill) * self.refill_per_second)
+            self._last_refill = now
+            if self.available >= weight:
+                self.available -= weight
+                return 0.0
+            return (weight - self.available) / self.refill_per_second
+
+    def reserve(self, weight):
+        """
+        Non-blocking variant of acquire(): books the weight immediately (the
+        bucket may go negative) and returns how many seconds the caller should
+        wait before actually sending the request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity,
+                                 self.available + (now - self._last_refill) * self.refill_per_second)
+            self._last_refill = now
+            self.available -= weight
+            return 0.0 if self.available >= 0 else -self.available / self.refill_per_second
+
+
+    def drain(self, seconds):
+        """
+        Empty the bucket and push it `seconds` worth of weight below zero, so
+        every thread waits at least that long. Returns the wait in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity,
+                                 self.available + (now - self._last_refill) * self.refill_per_second)
+            self._last_refill = now
+            self.available = min(self.available, -seconds * self.refill_per_second)
+            return -self.available / self.refill_per_second
+
+
+class KlineDownloader:
+    def __init__(self, client, cache_dir="kline_cache", max_workers=8,
+                 weight_per_minute=DEFAULT_WEIGHT_PER_MINUTE, max_retries=3, progress_callback=None):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.budget = RequestWeightBudget(weight_per_minute)
+        self.max_retries = max_retries
+        self.progress_callback = progress_callback
+        self.gaps = {}
+
+    def fetch(self, symbol, interval, start_str, end_str=None, cancel_event=None):
+        """Same result as client.get_historical_klines(symbol, interval, start_str, end_str)."""
+        return self.fetch_many([symbol], interval, start_str, end_str, cancel_event)[symbol]
+
+    def fetch_many(self, symbols, interval, start_str, end_str=None, cancel_event=None):
+        """
+        Download klines for several symbols at once.
+        Returns { "BTCUSDT": [kline, ...], ... }; detected gaps are stored in self.gaps.
+        Setting `cancel_event` stops the download with DownloadCancelled; chunks
+        finished so far stay cached for the next attempt.
+        """
+        interval_ms = interval_to_milliseconds(interval)
+        start_ms = self._to_ms(start_str)
+        end_ms = self._to_ms(end_str) if end_str else int(time.time() * 1000)
+        if interval_ms is None:
+            # Calendar intervals ("1M") have no fixed length, so there is no chunk grid
+            return self._fetch_sequential(symbols, interval, start_ms, end_ms, cancel_event)
+        chunk_ms = interval_ms * BARS_PER_REQUEST
+
+        jobs = []
+        for symbol in symbols:
+            chunk_start = start_ms - start_ms % chunk_ms
+            while chunk_start <= end_ms:
+                jobs.append((symbol, chunk_start, chunk_start + chunk_ms - 1))
+                chunk_start += chunk_ms
+
+        chunks = {symbol: {} for symbol in symbols}
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_chunk, symbol, interval, chunk_start, chunk_end, cancel_event):
+                    (symbol, chunk_start)
+                for symbol, chunk_start, chunk_end in jobs
+            }
+            try:
+                for future, (symbol, chunk_start) in futures.items():
+                    chunks[symbol][chunk_start] = future.result()
+                    done += 1
+                    if self.progress_callback is not None:
+                        self.progress_callback(done, len(jobs), symbol)
+            except BaseException:
+                # Don't wait for the queued chunks before reporting the failure
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        results = {}
+        for symbol in symbols:
+            klines = self._assemble(chunks[symbol], start_ms, end_ms)
+            self.gaps[symbol] = self._find_gaps(klines, interval_ms)
+            for gap_start, gap_end in self.gaps[symbol]:
+                logger.warning("Gap in %s %s klines: no bars between %s and %s",
+                               symbol, interval, gap_start, gap_end)
+            results[symbol] = klines
+        return results
+
+    def _fetch_sequential(self, symbols, interval, start_ms, end_ms, cancel_event=None):
+        """Page through the range one request at a time, like get_historical_klines; not cached."""
+        results = {}
+        for done, symbol in enumerate(symbols, 1):
+            klines = []
+            page_start = start_ms
+            while page_start <= end_ms:
+                page = self._request(symbol, interval, page_start, end_ms, cancel_event)
+                if not page:
+                    break
+                klines.extend(page)
+                if len(page) < BARS_PER_REQUEST:
+                    break
+                page_start = page[-1][0] + 1
+            results[symbol] = klines
+            self.gaps[symbol] = []
+            if self.progress_callback is not None:
+                self.progress_callback(done, len(symbols), symbol)
+        return results
+
+    def _to_ms(self, value):
+        return int(value) if isinstance(value, (int, float)) else date_to_milliseconds(value)
+
+    def _chunk_path(self, symbol, interval, chunk_start):
+        return os.path.join(self.cache_dir, f"{symbol}_{interval}", f"{chunk_start}.json")
+
+    def _fetch_chunk(self, symbol, interval, chunk_start, chunk_end, cancel_event=None):
+        path = self._chunk_path(symbol, interval, chunk_start)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+
+        klines = self._request(symbol, interval, chunk_start, chunk_end, cancel_event)
+
+        # The whole chunk is requested whatever end_ms is, so it can be checkpointed
+        # once its last bar has closed; the most recent chunk still has an open bar
+        # and must be fetched again next time.
+        if chunk_end < int(time.time() * 1000):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(klines, f)
+            os.replace(tmp_path, path)
+        return klines
+
+    def _request(self, symbol, interval, start_ms, end_ms, cancel_event=None):
+        backoff_seconds = 1
+        for attempt in range(self.max_retries + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled()
+            self.budget.acquire(KLINES_REQUEST_WEIGHT, cancel_event)
+            delay = backoff_seconds
+            try:
+                return self.client.get_klines(symbol=symbol, interval=interval, limit=BARS_PER_REQUEST,
+                                              startTime=start_ms, endTime=end_ms)
+            except BinanceAPIException as e:
+                if attempt == self.max_retries:
+                    raise
+                if e.status_code in (418, 429):
+                    # Rate limited: drain the shared bucket for Retry-After (or a full minute),
+                    # so every other thread waits too instead of piling on more requests
+                    delay = max(delay, self.budget.drain(self._retry_after(e) or 60.0))
+                logger.warning("get_klines %s %s failed (%s), retrying in %.1f seconds",
+                               symbol, start_ms, e, delay)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("get_klines %s %s failed (%s), retrying in %.1f seconds",
+                               symbol, start_ms, e, delay)
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise DownloadCancelled()
+            backoff_seconds *= 2
+
+    @staticmethod
+    def _retry_after(error):
+        response = getattr(error, "response", None)
+        try:
+            return float(response.headers.get("Retry-After", 0))
+        except (AttributeError, TypeError, ValueError):
+            return 0.0
+
+    @staticmethod
+    def _assemble(chunks, start_ms, end_ms):
+        klines = []
+        last_open_time = None
+        for chunk_start in sorted(chunks):
+            for kline in chunks[chunk_start]:
+                open_time = kline[0]
+                if open_time < start_ms or open_time > end_ms:
+                    continue
+                if last_open_time is not None and open_time <= last_open_time:
+                    continue
+                klines.append(kline)
+                last_open_time = open_time
+        return klines
+
+    @staticmethod
+    def _find_gaps(klines, interval_ms):
+        gaps = []
+        for prev, cur in zip(klines, klines[1:]):
+            if cur[0] - prev[0] > interval_ms:
+                gaps.append((prev[0] + interval_ms, cur[0] - 1))
+        return gaps
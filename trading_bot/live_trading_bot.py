@@ -6,11 +6,12 @@ Features:
 - Dynamic quantity calculation (percentage of USDT)
 - Symbol precision/step size handling via exchangeInfo
 - Stop-loss / Take-profit per position
-- Trade logging to CSV
+- Trade logging to CSV, with running performance metrics (`metrics.py`)
 - Robust error handling + backoff retries
 - Connectivity check with exponential backoff
 - Heartbeat log every poll interval
 - Uses strategies from `strategies.py` (SimpleSmaStrategy or others)
+- Optional dynamic symbol universe refreshed by `universe_scanner.py`
 """
 
 import os
@@ -18,12 +19,13 @@ import time
 import math
 import csv
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import pandas as pd
-from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceOrderException
 
+from binance_client_factory import get_client, sync_clock_offset
+from metrics import IncrementalMetrics, format_metrics
 from strategies import SimpleSmaStrategy, MovingAverageCrossStrategy  # your strategies file
 
 # Load environment variables
@@ -49,9 +51,7 @@ logger = logging.getLogger("live_bot")
 # --- Binance API wrapper ---
 class BinanceWrapper:
     def __init__(self, api_key, api_secret, testnet=TESTNET):
-        self.client = Client(api_key, api_secret)
-        if testnet:
-            self.client.API_URL = 'https://testnet.binance.vision/api'
+        self.client = get_client(api_key, api_secret, testnet=testnet)
         self._symbol_info = {}
 
     # Connectivity check method
@@ -81,6 +81,10 @@ class BinanceWrapper:
     def get_all_tickers(self):
         return self.client.get_all_tickers()
 
+    def get_24h_tickers(self):
+        # No symbol -> 24h statistics for every symbol in a single request
+        return self.client.get_ticker()
+
     def get_symbol_info(self, symbol):
         if symbol in self._symbol_info:
             return self._symbol_info[symbol]
@@ -107,6 +111,7 @@ class BinanceWrapper:
 
     def get_asset_free(self, asset):
         try:
+            sync_clock_offset(self.client)
             bal = self.client.get_asset_balance(asset=asset)
             return float(bal["free"]) if bal and bal.get("free") is not None else 0.0
         except Exception as e:
@@ -114,17 +119,22 @@ class BinanceWrapper:
             return 0.0
 
     def market_buy(self, symbol, quantity):
+        sync_clock_offset(self.client)
         return self.client.create_order(symbol=symbol, side="BUY", type="MARKET", quantity=quantity)
 
     def market_sell(self, symbol, quantity):
+        sync_clock_offset(self.client)
         return self.client.create_order(symbol=symbol, side="SELL", type="MARKET", quantity=quantity)
 
 
 # --- Trade logger to CSV ---
 class TradeLogger:
-    def __init__(self, csv_path=TRADE_LOG_CSV):
+    def __init__(self, csv_path=TRADE_LOG_CSV, clock=None, track_metrics=True):
         self.csv_path = csv_path
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
         self._ensure_file()
+        # Running metrics over the log, checkpointed next to it (<csv>.metrics.json)
+        self.metrics = IncrementalMetrics(checkpoint_path=csv_path + ".metrics.json") if track_metrics else None
 
     def _ensure_file(self):
         if not os.path.exists(self.csv_path):
@@ -135,21 +145,45 @@ class TradeLogger:
                     "balance_before", "balance_after", "reason"
                 ])
 
+    def reset(self):
+        """Start over with an empty log and, if tracked, fresh metrics (e.g. for a replay)."""
+        if os.path.exists(self.csv_path):
+            os.remove(self.csv_path)
+        self._ensure_file()
+        if self.metrics is not None:
+            if os.path.exists(self.metrics.checkpoint_path):
+                os.remove(self.metrics.checkpoint_path)
+            self.metrics = IncrementalMetrics(checkpoint_path=self.metrics.checkpoint_path)
+
     def log_trade(self, symbol, action, price, amount, balance_before, balance_after, reason):
-        ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        ts = self.clock().strftime("%Y-%m-%d %H:%M:%S")
         with open(self.csv_path, "a", newline="") as f:
             writer = csv.writer(f)
             writer.writerow([ts, symbol, action, price, amount, balance_before, balance_after, reason])
         logger.info("Logged trade: %s %s %s", action, amount, symbol)
 
+        if self.metrics is not None:
+            try:
+                metrics = self.metrics.update_from_log(self.csv_path)
+                if action == "SELL":
+                    logger.info("Live metrics: %s", format_metrics(metrics))
+            except Exception as e:
+                logger.exception("Updating live metrics failed: %s", e)
+
 
 # --- Main Live Trading Bot ---
 class LiveTradingBot:
     def __init__(self, api_key, api_secret, symbols, strategy_factory,
                  usdt_percent=USDT_PERCENT_PER_TRADE,
                  stop_loss_pct=STOP_LOSS_PCT, take_profit_pct=TAKE_PROFIT_PCT,
-                 poll_interval=POLL_INTERVAL_SECONDS, testnet=TESTNET):
-        self.wrapper = BinanceWrapper(api_key, api_secret, testnet=testnet)
+                 poll_interval=POLL_INTERVAL_SECONDS, testnet=TESTNET,
+                 wrapper=None, trade_log_csv=TRADE_LOG_CSV, clock=None, sleep=time.sleep,
+                 trade_logger=None, scanner=None, rescan_interval=3600):
+        # wrapper/clock/sleep can be swapped out (e.g. for exchange_simulator.SimulatedExchange)
+        # to replay the bot against stored data on a virtual clock.
+        self.wrapper = wrapper or BinanceWrapper(api_key, api_secret, testnet=testnet)
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.sleep = sleep
         self.symbols = symbols
         self.strategy_factory = strategy_factory
         self.usdt_percent = usdt_percent
@@ -160,9 +194,69 @@ class LiveTradingBot:
         # Per-symbol state
         self.state = {}
         for s in symbols:
-            self.state[s] = {"qty": 0.0, "entry_price": 0.0, "last_action": None, "strategy": strategy_factory()}
-
-        self.trade_logger = TradeLogger()
+            self.state[s] = self._new_state()
+
+        self.trade_logger = trade_logger or TradeLogger(trade_log_csv, clock=self.clock)
+
+        # Optional universe_scanner.UniverseScanner refreshing self.symbols every rescan_interval seconds
+        self.scanner = scanner
+        self.rescan_interval = rescan_interval
+        self._next_rescan = None
+
+    def _new_state(self):
+        return {"qty": 0.0, "entry_price": 0.0, "last_action": None, "strategy": self.strategy_factory(),
+                "retiring": False}
+
+    def set_symbols(self, symbols):
+        """
+        Swap the traded universe without restarting. New symbols get fresh
+        state; dropped symbols are disposed of once flat. Dropped symbols
+        that still hold a position stay in the loop (so SL/TP and SELL
+        signals can close it) but take no new entries, and are removed by
+        _drop_retired() on the tick that closes the position.
+        """
+        wanted = list(dict.fromkeys(symbols))
+        for symbol in wanted:
+            if symbol not in self.state:
+                self.state[symbol] = self._new_state()
+            self.state[symbol]["retiring"] = False
+
+        for symbol in list(self.state):
+            if symbol in wanted:
+                continue
+            if self.state[symbol]["qty"] > 0:
+                self.state[symbol]["retiring"] = True
+                wanted.append(symbol)
+            else:
+                del self.state[symbol]
+
+        added = [s for s in wanted if s not in self.symbols]
+        removed = [s for s in self.symbols if s not in wanted]
+        self.symbols = wanted
+        if added or removed:
+            logger.info("Universe updated: +%s -%s", added, removed)
+
+    def _drop_retired(self):
+        retired = [s for s in self.symbols if self.state[s]["retiring"] and self.state[s]["qty"] == 0]
+        if retired:
+            for symbol in retired:
+                del self.state[symbol]
+            self.symbols = [s for s in self.symbols if s not in retired]
+            logger.info("Universe updated: -%s (position closed)", retired)
+
+    def _maybe_rescan(self):
+        if self.scanner is None:
+            return
+        now = self.clock()
+        if self._next_rescan is not None and now < self._next_rescan:
+            return
+        try:
+            symbols = self.scanner.scan()
+            if symbols is not None:
+                self.set_symbols(symbols)
+        except Exception as e:
+            logger.exception("Universe scan failed, keeping current symbols: %s", e)
+        self._next_rescan = now + timedelta(seconds=self.rescan_interval)
 
     def get_current_price(self, symbol):
         tickers = self.wrapper.get_all_tickers()
@@ -181,22 +275,25 @@ class LiveTradingBot:
         qty = self.wrapper.round_quantity(symbol, raw_qty)
         return qty
 
-    def run(self):
+    def run(self, max_ticks=None):
         logger.info("Starting LiveTradingBot for symbols: %s | Test: %s", self.symbols, TESTNET)
         backoff_seconds = 1
         max_backoff = 60
+        ticks = 0
 
-        while True:
+        while max_ticks is None or ticks < max_ticks:
             if not self.wrapper.check_connectivity():
                 logger.error(f"No connectivity to Binance API. Retrying in {backoff_seconds} seconds...")
-                time.sleep(backoff_seconds)
+                self.sleep(backoff_seconds)
                 backoff_seconds = min(backoff_seconds * 2, max_backoff)
                 continue
             else:
                 backoff_seconds = 1  # reset backoff on success
 
+            self._maybe_rescan()
+
             # Heartbeat log
-            logger.info(f"Heartbeat: Bot running for symbols {self.symbols} at {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}")
+            logger.info(f"Heartbeat: Bot running for symbols {self.symbols} at {self.clock().strftime('%Y-%m-%d %H:%M:%S UTC')}")
 
             for symbol in self.symbols:
                 try:
@@ -212,9 +309,15 @@ class LiveTradingBot:
                         logger.warning(f"No data for {symbol}")
                         continue
 
-                    # Run strategy
-                    trades, _ = strategy.run(df)
-                    last_trade = trades[-1] if trades else None
+                    # Run strategy: rule strategies evaluate only the new closed bars,
+                    # others re-run over the whole window and act on the last trade
+                    if hasattr(strategy, "update_live"):
+                        buy_signal, sell_signal = strategy.update_live(df, now=self.clock())
+                    else:
+                        trades, _ = strategy.run(df)
+                        last_trade = trades[-1] if trades else None
+                        buy_signal = last_trade is not None and last_trade["action"] == "BUY"
+                        sell_signal = last_trade is not None and last_trade["action"] == "SELL"
                     current_price = self.get_current_price(symbol)
 
                     # Stop-loss / Take-profit
@@ -241,7 +344,7 @@ class LiveTradingBot:
                             continue
 
                     # Strategy signals
-                    if last_trade and last_trade["action"] == "BUY" and qty_held == 0:
+                    if buy_signal and qty_held == 0 and not state["retiring"]:
                         qty = self.calculate_quantity_from_usdt(symbol, self.usdt_percent)
                         if qty > 0:
                             balance_before = self.wrapper.get_asset_free("USDT")
@@ -253,7 +356,7 @@ class LiveTradingBot:
                             self.trade_logger.log_trade(symbol, "BUY", current_price, qty,
                                                         balance_before, balance_after, "Strategy signal")
 
-                    elif last_trade and last_trade["action"] == "SELL" and qty_held > 0:
+                    elif sell_signal and qty_held > 0:
                         qty_to_sell = self.wrapper.round_quantity(symbol, qty_held)
                         balance_before = self.wrapper.get_asset_free("USDT")
                         order = self.wrapper.market_sell(symbol, qty_to_sell)
@@ -268,7 +371,9 @@ class LiveTradingBot:
                 except Exception as e:
                     logger.exception("Error processing symbol %s: %s", symbol, e)
 
-            time.sleep(self.poll_interval)
+            self._drop_retired()
+            ticks += 1
+            self.sleep(self.poll_interval)
 
 
 if __name__ == "__main__":
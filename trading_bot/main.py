@@ -1,6 +1,5 @@
 from dotenv import load_dotenv
 import os
-from gui import TradingBotGUI
 
 def main():
     load_dotenv()  # This loads variables from .env into environment
@@ -12,6 +11,8 @@ def main():
         print("Error: Please set BINANCE_API_KEY and BINANCE_API_SECRET environment variables.")
         return
 
+    # Imported here so the tkinter/pandas/Binance imports only happen once the keys are known to be set
+    from gui import TradingBotGUI
     app = TradingBotGUI(api_key, api_secret)
     app.mainloop()
 
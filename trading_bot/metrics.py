@@ -0,0 +1,253 @@
+"""
+metrics.py
+
+Performance metrics for backtests and live trading.
+
+- compute_metrics(): vectorized Sharpe, Sortino, max drawdown, win rate
+  and exposure over a full equity curve (backtests)
+- IncrementalMetrics: the same metrics updated in O(1) per trade from the
+  live trade stream, with a JSON checkpoint that remembers how far into
+  live_trade_log.csv it has read, so the log is never rescanned.
+  TradeLogger feeds it after every logged trade.
+
+Usage:
+    python metrics.py live_trade_log.csv
+"""
+
+import csv
+import json
+import math
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+
+from trade_records import BUY, SELL, close_times_ms
+
+MS_PER_YEAR = 365 * 24 * 60 * 60 * 1000
+
+
+def periods_per_year(interval):
+    """Bars per year for a Binance kline interval ("1h" -> 8760, "1M" -> 12)."""
+    interval_ms = interval_to_milliseconds(interval)
+    return MS_PER_YEAR / interval_ms if interval_ms else 12
+
+
+def equity_curve(data: pd.DataFrame, trades, initial_balance=1000):
+    """
+    Mark-to-market equity at every bar close for a TradeBatch produced on `data`,
+    plus a boolean array telling whether a position was held at that bar.
+    """
+    closes = data["close"].to_numpy(dtype=np.float64)
+    bar_times = close_times_ms(data)
+    records = trades.records
+
+    if len(records) == 0:
+        return np.full(len(closes), float(initial_balance)), np.zeros(len(closes), dtype=bool)
+
+    # Index of the last trade at or before each bar (-1 = before the first trade)
+    last_trade = np.searchsorted(records["timestamp"], bar_times, side="right") - 1
+    has_trade = last_trade >= 0
+    idx = np.where(has_trade, last_trade, 0)
+
+    in_position = has_trade & (records["action"][idx] == BUY)
+    equity = np.where(
+        in_position,
+        records["amount"][idx] * closes,
+        np.where(has_trade, records["balance_after"][idx], float(initial_balance)),
+    )
+    return equity, in_position
+
+
+def round_trip_pnls(trades):
+    """Profit of each BUY -> SELL round trip in a TradeBatch."""
+    records = trades.records
+    buys = records[records["action"] == BUY]
+    sells = records[records["action"] == SELL]
+    n = min(len(buys), len(sells))
+    return sells["balance_after"][:n] - buys["balance_before"][:n]
+
+
+def compute_metrics(equity, in_position=None, trade_pnls=None, periods_per_year=365 * 24):
+    equity = np.asarray(equity, dtype=np.float64)
+    metrics = {
+        "total_return": 0.0, "sharpe": 0.0, "sortino": 0.0, "max_drawdown": 0.0,
+        "win_rate": 0.0, "exposure": 0.0, "trades": 0,
+    }
+    if len(equity) < 2:
+        return metrics
+
+    returns = np.diff(equity) / equity[:-1]
+    returns = returns[np.isfinite(returns)]
+    metrics["total_return"] = equity[-1] / equity[0] - 1
+
+    if len(returns) > 1:
+        std = returns.std(ddof=1)
+        if std > 0:
+            metrics["sharpe"] = returns.mean() / std * math.sqrt(periods_per_year)
+        downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+        if downside > 0:
+            metrics["sortino"] = returns.mean() / downside * math.sqrt(periods_per_year)
+
+    running_peak = np.maximum.accumulate(equity)
+    metrics["max_drawdown"] = float(np.max(1 - equity / running_peak))
+
+    if in_position is not None:
+        metrics["exposure"] = float(np.mean(in_position))
+    if trade_pnls is not None and len(trade_pnls):
+        metrics["win_rate"] = float(np.mean(np.asarray(trade_pnls) > 0))
+        metrics["trades"] = len(trade_pnls)
+    return metrics
+
+
+def format_metrics(metrics):
+    return (
+        f"Return: {metrics['total_return']:.2%} | Sharpe: {metrics['sharpe']:.2f} | "
+        f"Sortino: {metrics['sortino']:.2f} | Max DD: {metrics['max_drawdown']:.2%} | "
+        f"Win rate: {metrics['win_rate']:.2%} ({metrics['trades']} trades) | "
+        f"Exposure: {metrics['exposure']:.2%}"
+    )
+
+
+class IncrementalMetrics:
+    """
+    Running metrics over closed round trips from the live trade log.
+
+    Each SELL closes the open BUY of the same symbol and moves equity by its
+    profit (USDT received - USDT spent), both taken from the logged price *
+    amount. The logged balances are not used for this: in sharded mode other
+    shards' fills can land between them. Equity starts at the USDT balance
+    before the first logged trade unless `starting_equity` is given, and
+    the return of a round trip is its profit over the equity before it.
+    Mean/variance use Welford's algorithm, so every update is O(1).
+
+    Like compute_metrics(), Sharpe and Sortino are annualized: the equity
+    returns are sampled per closed trade, so they are scaled by the number
+    of closed trades per year observed so far. Exposure is the fraction of
+    wall time with at least one open position.
+    """
+    def __init__(self, starting_equity=None, checkpoint_path=None):
+        self.checkpoint_path = checkpoint_path
+        self.initial_equity = starting_equity
+        self._reset(starting_equity)
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self.load()
+
+    def _reset(self, starting_equity=None):
+        self.log_offset = 0
+        self.starting_equity = starting_equity
+        self.equity = starting_equity
+        self.peak_equity = starting_equity
+        self.max_drawdown = 0.0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_sq = 0.0
+        self.wins = 0
+        self.open_positions = {}      # symbol -> USDT spent
+        self.first_ts = None
+        self.last_ts = None
+        self.exposed_since = None
+        self.exposed_ms = 0
+
+    def _advance_time(self, ts):
+        if self.first_ts is None:
+            self.first_ts = ts
+        if self.exposed_since is not None:
+            self.exposed_ms += ts - self.exposed_since
+            self.exposed_since = ts
+        self.last_ts = ts
+
+    def update(self, timestamp_ms, symbol, action, price, amount, balance_before):
+        self._advance_time(timestamp_ms)
+        if self.starting_equity is None:
+            self.starting_equity = self.equity = self.peak_equity = balance_before
+
+        if action == "BUY":
+            self.open_positions[symbol] = price * amount
+            if self.exposed_since is None:
+                self.exposed_since = timestamp_ms
+            return
+
+        cost = self.open_positions.pop(symbol, None)
+        if not self.open_positions:
+            self.exposed_since = None
+        if not cost or cost <= 0:
+            return
+
+        pnl = price * amount - cost
+        if self.equity <= 0:
+            return
+        ret = pnl / self.equity
+
+        self.count += 1
+        delta = ret - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (ret - self.mean)
+        self.downside_sq += min(ret, 0.0) ** 2
+        if pnl > 0:
+            self.wins += 1
+
+        self.equity += pnl
+        self.peak_equity = max(self.peak_equity, self.equity)
+        if self.peak_equity > 0:
+            self.max_drawdown = max(self.max_drawdown, 1 - self.equity / self.peak_equity)
+
+    def update_from_log(self, csv_path):
+        """Feed only the rows appended to the TradeLogger CSV since the last call."""
+        if self.log_offset > os.path.getsize(csv_path):
+            # The log was replaced since the checkpoint: start over
+            self._reset(self.initial_equity)
+        with open(csv_path, newline="") as f:
+            if self.log_offset == 0:
+                f.readline()  # header
+            else:
+                f.seek(self.log_offset)
+            # readline() instead of iterating keeps f.tell() usable
+            line = f.readline()
+            while line.endswith("\n"):
+                row = next(csv.reader([line]))
+                ts = datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+                ts = int(ts.timestamp() * 1000)
+                self.update(ts, row[1], row[2], float(row[3]), float(row[4]), float(row[5]))
+                self.log_offset = f.tell()
+                line = f.readline()
+        if self.checkpoint_path:
+            self.save()
+        return self.metrics()
+
+    def metrics(self):
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        downside = math.sqrt(self.downside_sq / self.count) if self.count else 0.0
+        elapsed = (self.last_ts - self.first_ts) if self.first_ts is not None else 0
+        exposed = self.exposed_ms
+        scale = math.sqrt(self.count * MS_PER_YEAR / elapsed) if elapsed > 0 else 0.0
+        return {
+            "total_return": self.equity / self.starting_equity - 1 if self.starting_equity else 0.0,
+            "sharpe": self.mean / std * scale if std > 0 else 0.0,
+            "sortino": self.mean / downside * scale if downside > 0 else 0.0,
+            "max_drawdown": self.max_drawdown,
+            "win_rate": self.wins / self.count if self.count else 0.0,
+            "exposure": exposed / elapsed if elapsed > 0 else 0.0,
+            "trades": self.count,
+        }
+
+    def save(self):
+        state = {k: v for k, v in self.__dict__.items() if k != "checkpoint_path"}
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def load(self):
+        with open(self.checkpoint_path) as f:
+            self.__dict__.update(json.load(f))
+
+
+if __name__ == "__main__":
+    log_path = sys.argv[1] if len(sys.argv) > 1 else "live_trade_log.csv"
+    tracker = IncrementalMetrics(checkpoint_path=log_path + ".metrics.json")
+    print(format_metrics(tracker.update_from_log(log_path)))
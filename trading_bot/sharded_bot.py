@@ -0,0 +1,343 @@
+"""
+sharded_bot.py
+
+Sharded deployment mode for LiveTradingBot.
+
+- The symbol list is split across N worker processes, each running a
+  LiveTradingBot for its shard
+- One coordinator (the parent process) owns the account: USDT balance,
+  the shared request-weight budget, order submission and the trade log
+- Workers talk to the coordinator over multiprocessing Pipes
+
+Orders are handled one at a time by the coordinator, which checks each BUY
+against the USDT still free after earlier fills, so shards can't spend the
+same USDT twice. Tickers, balances, exchangeInfo and 24h statistics are
+cached in the coordinator, so N workers polling them cost about one request
+per refresh.
+
+With a universe_scanner.UniverseScanner, the coordinator scans once per
+rescan_interval and every shard trades only its round-robin slice of the
+ranking, so the symbols stay split across the workers.
+
+The coordinator never sleeps, so one throttled request can't hold up the
+other shards: orders (and the lookups they need) are booked against the
+budget and sent at once, while any other request that doesn't fit is
+answered with the time to wait, which the worker sleeps before retrying.
+
+Usage:
+    python sharded_bot.py --shards 4 BTCUSDT ETHUSDT BNBUSDT ...
+    python sharded_bot.py --shards 4 --scan-top 40     # universe from the scanner
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing.connection import wait
+
+from binance.exceptions import BinanceOrderException
+
+from kline_downloader import RequestWeightBudget
+from live_trading_bot import (API_KEY, API_SECRET, TESTNET, TRADE_LOG_CSV, BinanceWrapper,
+                              LiveTradingBot, TradeLogger, logger)
+from strategies import STRATEGIES
+from universe_scanner import UniverseScanner
+
+# Approximate Binance spot request weights
+WEIGHT_PING = 1
+WEIGHT_KLINES = 2
+WEIGHT_ALL_TICKERS = 4
+WEIGHT_ACCOUNT = 20
+WEIGHT_ORDER = 1
+WEIGHT_EXCHANGE_INFO = 20
+WEIGHT_24H_TICKERS = 80
+
+DEFAULT_WEIGHT_PER_MINUTE = 1200
+CACHE_TTL_SECONDS = 1.0
+TICKERS_24H_TTL_SECONDS = 60.0
+
+
+def split_symbols(symbols, shards):
+    """Round-robin split, so shards stay balanced whatever the list order."""
+    return [symbols[i::shards] for i in range(shards) if symbols[i::shards]]
+
+
+class Throttled(Exception):
+    def __init__(self, wait):
+        super().__init__(f"Request weight budget exhausted, retry in {wait:.2f}s")
+        self.wait = wait
+
+
+class OrderCoordinator:
+    def __init__(self, api_key, api_secret, testnet=TESTNET, weight_per_minute=DEFAULT_WEIGHT_PER_MINUTE,
+                 trade_log_csv=TRADE_LOG_CSV, scanner=None, rescan_interval=3600, shards=1):
+        self.wrapper = BinanceWrapper(api_key, api_secret, testnet=testnet)
+        self.budget = RequestWeightBudget(weight_per_minute)
+        self.trade_logger = TradeLogger(trade_log_csv)
+        self._tickers = None
+        self._tickers_at = 0.0
+        self._tickers_24h = None
+        self._tickers_24h_at = 0.0
+        self._balances = {}
+        self._exchange_info = None
+        self.scanner = scanner
+        self.rescan_interval = rescan_interval
+        self.shards = shards
+        self._universe = None
+        self._universe_at = 0.0
+
+    def _spend(self, weight, urgent=False):
+        """
+        Book `weight` without blocking. Urgent requests (orders) are always
+        sent, even if that takes the budget below zero; others raise
+        Throttled when it is exhausted.
+        """
+        if urgent:
+            self.budget.reserve(weight)
+            return
+        wait = self.budget.try_acquire(weight)
+        if wait > 0:
+            raise Throttled(wait)
+
+    def tickers(self, urgent=False):
+        if self._tickers is None or time.monotonic() - self._tickers_at > CACHE_TTL_SECONDS:
+            self._spend(WEIGHT_ALL_TICKERS, urgent)
+            self._tickers = self.wrapper.get_all_tickers()
+            self._tickers_at = time.monotonic()
+        return self._tickers
+
+    def tickers_24h(self):
+        if self._tickers_24h is None or time.monotonic() - self._tickers_24h_at > TICKERS_24H_TTL_SECONDS:
+            self._spend(WEIGHT_24H_TICKERS)
+            self._tickers_24h = self.wrapper.get_24h_tickers()
+            self._tickers_24h_at = time.monotonic()
+        return self._tickers_24h
+
+    def symbol_info(self, symbol, urgent=False):
+        # One exchangeInfo request for every symbol instead of one per symbol and worker
+        if self._exchange_info is None:
+            self._spend(WEIGHT_EXCHANGE_INFO, urgent)
+            self._exchange_info = {s["symbol"]: s for s in self.wrapper.client.get_exchange_info()["symbols"]}
+        return self._exchange_info.get(symbol)
+
+    def universe(self, shard_index):
+        """This shard's slice of the latest scan, or None without a scanner."""
+        if self.scanner is None:
+            return None
+        if self._universe is None or time.monotonic() - self._universe_at > self.rescan_interval:
+            self._universe = self.scanner.scan(self.tickers_24h())
+            self._universe_at = time.monotonic()
+        return self._universe[shard_index::self.shards]
+
+    def asset_free(self, asset, urgent=False):
+        cached = self._balances.get(asset)
+        if cached is None or time.monotonic() - cached[1] > CACHE_TTL_SECONDS:
+            self._spend(WEIGHT_ACCOUNT, urgent)
+            cached = (self.wrapper.get_asset_free(asset), time.monotonic())
+            self._balances[asset] = cached
+        return cached[0]
+
+    def _price(self, symbol):
+        for t in self.tickers(urgent=True):
+            if t["symbol"] == symbol:
+                return float(t["price"])
+        return None
+
+    def market_order(self, side, symbol, quantity):
+        info = self.symbol_info(symbol, urgent=True) or {}
+        quote = info.get("quoteAsset", "USDT")
+        base = info.get("baseAsset", symbol[:-len(quote)])
+
+        if side == "BUY":
+            price = self._price(symbol)
+            usdt_free = self.asset_free(quote, urgent=True)
+            if price is None or quantity * price > usdt_free:
+                raise BinanceOrderException(
+                    -2010, f"Coordinator: insufficient {quote} for {quantity} {symbol} ({usdt_free} free)")
+
+        self._spend(WEIGHT_ORDER, urgent=True)
+        if side == "BUY":
+            order = self.wrapper.market_buy(symbol, quantity)
+        else:
+            order = self.wrapper.market_sell(symbol, quantity)
+
+        # Balances changed; the next request has to see the post-fill values.
+        self._balances.pop(quote, None)
+        self._balances.pop(base, None)
+        return order
+
+    def handle(self, op, args):
+        if op == "weight":
+            return self.budget.reserve(*args)
+        if op == "tickers":
+            return self.tickers()
+        if op == "tickers_24h":
+            return self.tickers_24h()
+        if op == "symbol_info":
+            return self.symbol_info(*args)
+        if op == "universe":
+            return self.universe(*args)
+        if op == "asset_free":
+            return self.asset_free(*args)
+        if op == "market_order":
+            return self.market_order(*args)
+        if op == "log_trade":
+            return self.trade_logger.log_trade(*args)
+        raise ValueError(f"Unknown coordinator op {op!r}")
+
+    def serve(self, conns):
+        conns = list(conns)
+        while conns:
+            for conn in wait(conns):
+                try:
+                    op, args = conn.recv()
+                except EOFError:
+                    conns.remove(conn)
+                    continue
+                try:
+                    conn.send(("ok", self.handle(op, args)))
+                except Throttled as e:
+                    conn.send(("wait", e.wait))
+                except BinanceOrderException as e:
+                    conn.send(("order_error", (e.code, e.message)))
+                except Exception as e:
+                    logger.exception("Coordinator error on %s: %s", op, e)
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class CoordinatorConnection:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def call(self, op, *args):
+        while True:
+            self.conn.send((op, args))
+            status, result = self.conn.recv()
+            if status != "wait":
+                break
+            time.sleep(result)
+        if status == "ok":
+            return result
+        if status == "order_error":
+            raise BinanceOrderException(*result)
+        raise RuntimeError(result)
+
+
+class CoordinatedWrapper(BinanceWrapper):
+    """
+    BinanceWrapper used inside a worker: klines are still fetched directly
+    (after booking weight with the coordinator), while tickers, symbol info,
+    balances and orders go through the coordinator.
+    """
+    def __init__(self, api_key, api_secret, coordinator, testnet=TESTNET):
+        super().__init__(api_key, api_secret, testnet=testnet)
+        self.coordinator = coordinator
+
+    def _spend(self, weight):
+        time.sleep(self.coordinator.call("weight", weight))
+
+    def check_connectivity(self):
+        self._spend(WEIGHT_PING)
+        return super().check_connectivity()
+
+    def get_klines_df(self, symbol, interval="1m", limit=100):
+        self._spend(WEIGHT_KLINES)
+        return super().get_klines_df(symbol, interval=interval, limit=limit)
+
+    def get_all_tickers(self):
+        return self.coordinator.call("tickers")
+
+    def get_24h_tickers(self):
+        return self.coordinator.call("tickers_24h")
+
+    def get_symbol_info(self, symbol):
+        if symbol not in self._symbol_info:
+            self._symbol_info[symbol] = self.coordinator.call("symbol_info", symbol)
+        return self._symbol_info[symbol]
+
+    def get_asset_free(self, asset):
+        return self.coordinator.call("asset_free", asset)
+
+    def market_buy(self, symbol, quantity):
+        return self.coordinator.call("market_order", "BUY", symbol, quantity)
+
+    def market_sell(self, symbol, quantity):
+        return self.coordinator.call("market_order", "SELL", symbol, quantity)
+
+
+class CoordinatedTradeLogger:
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+
+    def log_trade(self, symbol, action, price, amount, balance_before, balance_after, reason):
+        self.coordinator.call("log_trade", symbol, action, price, amount, balance_before, balance_after, reason)
+
+
+class CoordinatedScanner:
+    """Scanner stand-in for a worker: returns its shard's slice of the coordinator's scan."""
+    def __init__(self, coordinator, shard_index):
+        self.coordinator = coordinator
+        self.shard_index = shard_index
+
+    def scan(self):
+        return self.coordinator.call("universe", self.shard_index)
+
+
+def run_worker(conn, api_key, api_secret, symbols, strategy_factory, testnet, bot_kwargs, shard_index=None):
+    coordinator = CoordinatorConnection(conn)
+    if shard_index is not None:
+        # The coordinator caches the scan, so asking every tick is cheap and
+        # all shards move to a new ranking within one poll of each other
+        bot_kwargs = dict(bot_kwargs, scanner=CoordinatedScanner(coordinator, shard_index), rescan_interval=0)
+    bot = LiveTradingBot(api_key, api_secret, symbols, strategy_factory, testnet=testnet,
+                         wrapper=CoordinatedWrapper(api_key, api_secret, coordinator, testnet=testnet),
+                         trade_logger=CoordinatedTradeLogger(coordinator), **bot_kwargs)
+    bot.run()
+
+
+def run_sharded(api_key, api_secret, symbols, strategy_factory, shards=None, testnet=TESTNET,
+                weight_per_minute=DEFAULT_WEIGHT_PER_MINUTE, scanner=None, rescan_interval=3600, **bot_kwargs):
+    """Start one worker process per shard and serve them from this process until they exit."""
+    shards = shards or mp.cpu_count()
+    if scanner is not None:
+        # Every shard gets a worker, even if the initial list is shorter, so later scans can fill it
+        shard_lists = [symbols[i::shards] for i in range(shards)]
+    else:
+        shard_lists = split_symbols(symbols, shards)
+    coordinator = OrderCoordinator(api_key, api_secret, testnet=testnet, weight_per_minute=weight_per_minute,
+                                   scanner=scanner, rescan_interval=rescan_interval, shards=len(shard_lists))
+
+    conns, workers = [], []
+    for shard_index, shard_symbols in enumerate(shard_lists):
+        parent_conn, child_conn = mp.Pipe()
+        worker = mp.Process(target=run_worker, daemon=True,
+                            args=(child_conn, api_key, api_secret, shard_symbols, strategy_factory,
+                                  testnet, bot_kwargs, shard_index if scanner is not None else None))
+        worker.start()
+        child_conn.close()
+        conns.append(parent_conn)
+        workers.append(worker)
+        logger.info("Started shard %s with %d symbols", worker.pid, len(shard_symbols))
+
+    try:
+        coordinator.serve(conns)
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run LiveTradingBot sharded across processes.")
+    parser.add_argument("symbols", nargs="*")
+    parser.add_argument("--shards", type=int, default=None)
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="sma")
+    parser.add_argument("--weight-per-minute", type=int, default=DEFAULT_WEIGHT_PER_MINUTE)
+    parser.add_argument("--scan-top", type=int, default=None,
+                        help="Trade the top N symbols of universe_scanner, rescanned hourly")
+    args = parser.parse_args()
+    if not args.symbols and not args.scan_top:
+        parser.error("give symbols or --scan-top")
+
+    # The coordinator passes the 24h tickers to scan(), so the scanner needs no wrapper
+    scanner = UniverseScanner(None, top_n=args.scan_top) if args.scan_top else None
+    run_sharded(API_KEY, API_SECRET, [s.upper() for s in args.symbols], STRATEGIES[args.strategy],
+                shards=args.shards, weight_per_minute=args.weight_per_minute, scanner=scanner)
@@ -1,152 +1,138 @@
+import numpy as np
 import pandas as pd
 
+from strategy_dsl import (ExpressionGraph, IncrementalEvaluator, compile_vectorized, is_edge_triggered,
+                          parse_rule, parse_rules)
+from trade_records import BUY, SELL, TradeBatchBuilder, close_times_ms
+
 class BaseStrategy:
     def run(self, data: pd.DataFrame):
         """
-        Must return trades as list of dicts with keys:
+        Must return (trades, final_balance), where trades is a
+        trade_records.TradeBatch (see TradeBatchBuilder) with fields
         'action', 'price', 'timestamp', 'balance_before', 'balance_after', 'amount'
         """
         raise NotImplementedError("Please implement the run() method")
 
-class SimpleSmaStrategy(BaseStrategy):
+def simulate_all_in(closes, timestamps, entry, exit, initial_balance=1000):
+    """
+    Shared BUY/SELL bookkeeping: go all in on an entry signal while flat,
+    sell everything on an exit signal while holding, and sell whatever is
+    still held at the last price. Only bars with a signal are visited.
+    """
+    trades = TradeBatchBuilder()
+    balance = initial_balance
+    position = 0
+
+    for idx in np.flatnonzero(entry | exit):
+        price = closes[idx]
+        balance_before = balance if position == 0 else position * price
+
+        if entry[idx] and position == 0:
+            amount = balance / price  # tokens bought
+            position = amount
+            balance = 0
+            trades.append(BUY, price, timestamps[idx], balance_before, balance, amount)
+
+        elif exit[idx] and position > 0:
+            amount = position  # tokens sold
+            balance = position * price
+            position = 0
+            trades.append(SELL, price, timestamps[idx], balance_before, balance, amount)
+
+    # If still holding tokens, sell at last price
+    if position > 0:
+        final_price = closes[-1]
+        amount = position
+        balance = position * final_price
+        trades.append(SELL, final_price, timestamps[-1], balance, balance, amount)
+
+    return trades.build(), balance
+
+class RuleStrategy(BaseStrategy):
+    """
+    Strategy defined by strategy_dsl entry/exit rules, e.g.
+    RuleStrategy("sma(close, 5) crosses_above sma(close, 20)",
+                 "sma(close, 5) crosses_below sma(close, 20)")
+
+    run() evaluates the rules vectorized over the whole DataFrame;
+    update_live() feeds only new closed bars to an incremental evaluator.
+    """
+    def __init__(self, entry, exit):
+        self.entry = entry
+        self.exit = exit
+        self.graph = ExpressionGraph()
+        self.roots = [parse_rule(entry, self.graph), parse_rule(exit, self.graph)]
+        self.series = sorted(set(self.graph.series_used()) | {"close"})
+        self._evaluate = compile_vectorized(self.graph, self.roots)
+        self._edge_triggered = [is_edge_triggered(root) for root in self.roots]
+        self._live = None
+        self._live_last_close_time = None
+        self._live_signals = (False, False)
+
+    @classmethod
+    def from_text(cls, text):
+        rules = parse_rules(text)
+        return cls(rules["entry"], rules["exit"])
+
+    def signals(self, data: pd.DataFrame):
+        """Boolean (entry, exit) arrays, one value per row of `data`."""
+        arrays = {name: pd.to_numeric(data[name]).to_numpy(dtype=float) for name in self.series}
+        return self._evaluate(arrays)
+
+    def run(self, data: pd.DataFrame):
+        entry, exit = self.signals(data)
+        closes = pd.to_numeric(data["close"]).to_numpy(dtype=float)
+        return simulate_all_in(closes, close_times_ms(data), entry, exit)
+
+    def update_live(self, data: pd.DataFrame, now=None):
+        """
+        (entry, exit) signal of the latest closed bar. Bars already seen are
+        skipped, as is the still-open bar (close_time after `now`), so every
+        bar goes through the incremental evaluator exactly once.
+
+        When no new bar has closed since the last call, level rules
+        (close > sma(close, 3)) repeat their signal, but edge rules
+        (crosses_above/crosses_below) return False: their event was already
+        reported, so polling faster than the bar interval can't fire it twice.
+        """
+        if self._live is None:
+            self._live = IncrementalEvaluator(self.graph, self.roots)
+
+        close_times = close_times_ms(data)
+        start = 0
+        if self._live_last_close_time is not None:
+            start = np.searchsorted(close_times, self._live_last_close_time, side="right")
+        stop = len(data)
+        if now is not None:
+            stop = np.searchsorted(close_times, int(now.timestamp() * 1000), side="right")
+        if start >= stop:
+            return tuple(signal and not edge for signal, edge in zip(self._live_signals, self._edge_triggered))
+
+        columns = {name: np.asarray(data[name].to_numpy()[start:stop], dtype=float) for name in self.series}
+        for offset in range(stop - start):
+            bar = {name: values[offset] for name, values in columns.items()}
+            self._live_signals = tuple(self._live.update(bar))
+        self._live_last_close_time = close_times[stop - 1]
+        return self._live_signals
+
+class SimpleSmaStrategy(RuleStrategy):
     def __init__(self, window=3):
         self.window = window
+        super().__init__(f"close > sma(close, {window})", f"close < sma(close, {window})")
 
-    def run(self, data: pd.DataFrame):
-        trades = []
-        data["SMA"] = data["close"].rolling(window=self.window).mean()
-        balance = 1000
-        position = 0
-
-        for idx, row in data.iterrows():
-            price = row["close"]
-            sma = row["SMA"]
-            timestamp = pd.to_datetime(row["close_time"], unit='ms')
-
-            if pd.isna(sma):
-                continue
-
-            balance_before = balance if position == 0 else position * price
-
-            if price > sma and position == 0:
-                amount = balance / price  # tokens bought
-                position = amount
-                balance = 0
-                balance_after = balance
-                trades.append({
-                    "action": "BUY",
-                    "price": price,
-                    "timestamp": timestamp,
-                    "balance_before": balance_before,
-                    "balance_after": balance_after,
-                    "amount": amount
-                })
-
-            elif price < sma and position > 0:
-                amount = position  # tokens sold
-                balance = position * price
-                position = 0
-                balance_after = balance
-                trades.append({
-                    "action": "SELL",
-                    "price": price,
-                    "timestamp": timestamp,
-                    "balance_before": balance_before,
-                    "balance_after": balance_after,
-                    "amount": amount
-                })
-
-        # If still holding tokens, sell at last price
-        if position > 0:
-            final_price = data["close"].iloc[-1]
-            final_timestamp = pd.to_datetime(data["close_time"].iloc[-1], unit='ms')
-            balance_before = position * final_price
-            amount = position
-            balance = position * final_price
-            position = 0
-            balance_after = balance
-            trades.append({
-                "action": "SELL",
-                "price": final_price,
-                "timestamp": final_timestamp,
-                "balance_before": balance_before,
-                "balance_after": balance_after,
-                "amount": amount
-            })
-
-        return trades, balance
-
-class MovingAverageCrossStrategy(BaseStrategy):
+class MovingAverageCrossStrategy(RuleStrategy):
     def __init__(self, short_window=5, long_window=20):
         self.short_window = short_window
         self.long_window = long_window
-
-    def run(self, data: pd.DataFrame):
-        trades = []
-        data["SMA_short"] = data["close"].rolling(window=self.short_window).mean()
-        data["SMA_long"] = data["close"].rolling(window=self.long_window).mean()
-        balance = 1000
-        position = 0
-
-        for idx in range(1, len(data)):
-            price = data["close"].iloc[idx]
-            timestamp = pd.to_datetime(data["close_time"].iloc[idx], unit='ms')
-
-            sma_short = data["SMA_short"].iloc[idx]
-            sma_long = data["SMA_long"].iloc[idx]
-            prev_sma_short = data["SMA_short"].iloc[idx - 1]
-            prev_sma_long = data["SMA_long"].iloc[idx - 1]
-
-            if pd.isna(sma_short) or pd.isna(sma_long) or pd.isna(prev_sma_short) or pd.isna(prev_sma_long):
-                continue
-
-            balance_before = balance if position == 0 else position * price
-
-            # Golden cross: buy
-            if prev_sma_short <= prev_sma_long and sma_short > sma_long and position == 0:
-                amount = balance / price
-                position = amount
-                balance = 0
-                balance_after = balance
-                trades.append({
-                    "action": "BUY",
-                    "price": price,
-                    "timestamp": timestamp,
-                    "balance_before": balance_before,
-                    "balance_after": balance_after,
-                    "amount": amount
-                })
-
-            # Death cross: sell
-            elif prev_sma_short >= prev_sma_long and sma_short < sma_long and position > 0:
-                amount = position
-                balance = position * price
-                position = 0
-                balance_after = balance
-                trades.append({
-                    "action": "SELL",
-                    "price": price,
-                    "timestamp": timestamp,
-                    "balance_before": balance_before,
-                    "balance_after": balance_after,
-                    "amount": amount
-                })
-
-        if position > 0:
-            final_price = data["close"].iloc[-1]
-            final_timestamp = pd.to_datetime(data["close_time"].iloc[-1], unit='ms')
-            balance_before = position * final_price
-            amount = position
-            balance = position * final_price
-            position = 0
-            balance_after = balance
-            trades.append({
-                "action": "SELL",
-                "price": final_price,
-                "timestamp": final_timestamp,
-                "balance_before": balance_before,
-                "balance_after": balance_after,
-                "amount": amount
-            })
-
-        return trades, balance
\ No newline at end of file
+        super().__init__(
+            f"sma(close, {short_window}) crosses_above sma(close, {long_window})",
+            f"sma(close, {short_window}) crosses_below sma(close, {long_window})",
+        )
+
+# Name -> class lookup for code that builds strategies from config (e.g. batch_backtest.py)
+STRATEGIES = {
+    "sma": SimpleSmaStrategy,
+    "ma_cross": MovingAverageCrossStrategy,
+    "rules": RuleStrategy,
+}
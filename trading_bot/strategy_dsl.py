@@ -0,0 +1,479 @@
+"""
+strategy_dsl.py
+
+Small rule language for strategies, e.g.
+
+    entry: sma(close, 5) crosses_above sma(close, 20)
+    exit:  sma(close, 5) crosses_below sma(close, 20)
+
+Rules are parsed into an expression graph in which identical
+subexpressions are shared (sma(close, 5) above is one node), then compiled
+two ways:
+
+- compile_vectorized(): evaluates every node once over whole NumPy arrays
+  (backtests)
+- IncrementalEvaluator: keeps O(window) state per node and evaluates one
+  new bar at a time (live trading)
+
+Syntax:
+- series: open, high, low, close, volume
+- numbers: 3, 0.5
+- functions: sma(x, n), ema(x, n), highest(x, n), lowest(x, n), prev(x, n=1)
+- arithmetic: + - * / and parentheses
+- comparisons: > < >= <=, crosses_above, crosses_below
+- logic: and, or, not
+
+Comparisons involving a value that isn't available yet (warm-up NaN) are False.
+"""
+
+import math
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+SERIES = ("open", "high", "low", "close", "volume")
+WINDOW_FUNCTIONS = ("sma", "ema", "highest", "lowest")
+COMPARISONS = (">", "<", ">=", "<=", "crosses_above", "crosses_below")
+ARITHMETIC = ("+", "-", "*", "/")
+
+TOKEN_RE = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)|([A-Za-z_]\w*)|(>=|<=|[-+*/(),<>]))")
+
+
+class RuleSyntaxError(ValueError):
+    pass
+
+
+class Node:
+    __slots__ = ("index", "op", "args", "param", "is_bool")
+
+    def __init__(self, index, op, args, param, is_bool):
+        self.index = index
+        self.op = op
+        self.args = args
+        self.param = param
+        self.is_bool = is_bool
+
+    def __repr__(self):
+        return f"Node({self.index}, {self.op}, {[a.index for a in self.args]}, {self.param})"
+
+
+class ExpressionGraph:
+    """
+    Hash-consed expression nodes. Building the same expression twice returns
+    the same node, so shared subexpressions are evaluated only once.
+    `nodes` is in creation order, which is also a valid evaluation order.
+    """
+    def __init__(self):
+        self.nodes = []
+        self._interned = {}
+
+    def node(self, op, args=(), param=None, is_bool=False):
+        key = (op, tuple(a.index for a in args), param)
+        existing = self._interned.get(key)
+        if existing is not None:
+            return existing
+        node = Node(len(self.nodes), op, tuple(args), param, is_bool)
+        self.nodes.append(node)
+        self._interned[key] = node
+        return node
+
+    def series_used(self):
+        return [n.param for n in self.nodes if n.op == "series"]
+
+
+class _Parser:
+    def __init__(self, text, graph):
+        self.graph = graph
+        self.tokens = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            match = TOKEN_RE.match(text, pos)
+            if not match or match.end() == pos:
+                raise RuleSyntaxError(f"Unexpected character at {pos}: {text[pos:pos + 10]!r}")
+            number, name, symbol = match.groups()
+            if number is not None:
+                self.tokens.append(("number", float(number)))
+            elif name is not None:
+                self.tokens.append(("name", name.lower()))
+            else:
+                self.tokens.append(("symbol", symbol))
+            pos = match.end()
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, symbol):
+        kind, value = self.take()
+        if kind != "symbol" or value != symbol:
+            raise RuleSyntaxError(f"Expected {symbol!r}, got {value!r}")
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise RuleSyntaxError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def _bool(self, node, op):
+        if not node.is_bool:
+            raise RuleSyntaxError(f"'{op}' needs a condition, not a number")
+        return node
+
+    def _num(self, node, op):
+        if node.is_bool:
+            raise RuleSyntaxError(f"'{op}' needs a number, not a condition")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ("name", "or"):
+            self.take()
+            right = self.parse_and()
+            node = self.graph.node("or", (self._bool(node, "or"), self._bool(right, "or")), is_bool=True)
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ("name", "and"):
+            self.take()
+            right = self.parse_not()
+            node = self.graph.node("and", (self._bool(node, "and"), self._bool(right, "and")), is_bool=True)
+        return node
+
+    def parse_not(self):
+        if self.peek() == ("name", "not"):
+            self.take()
+            return self.graph.node("not", (self._bool(self.parse_not(), "not"),), is_bool=True)
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_additive()
+        kind, value = self.peek()
+        if kind in ("symbol", "name") and value in COMPARISONS:
+            self.take()
+            right = self.parse_additive()
+            return self.graph.node(value, (self._num(left, value), self._num(right, value)), is_bool=True)
+        return left
+
+    def parse_additive(self):
+        node = self.parse_multiplicative()
+        while self.peek() in (("symbol", "+"), ("symbol", "-")):
+            op = self.take()[1]
+            right = self.parse_multiplicative()
+            node = self.graph.node(op, (self._num(node, op), self._num(right, op)))
+        return node
+
+    def parse_multiplicative(self):
+        node = self.parse_unary()
+        while self.peek() in (("symbol", "*"), ("symbol", "/")):
+            op = self.take()[1]
+            right = self.parse_unary()
+            node = self.graph.node(op, (self._num(node, op), self._num(right, op)))
+        return node
+
+    def parse_unary(self):
+        if self.peek() == ("symbol", "-"):
+            self.take()
+            operand = self._num(self.parse_unary(), "-")
+            return self.graph.node("-", (self.graph.node("const", param=0.0), operand))
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, value = self.take()
+        if kind == "number":
+            return self.graph.node("const", param=value)
+        if kind == "symbol" and value == "(":
+            node = self.parse_or()
+            self.expect(")")
+            return node
+        if kind == "name" and value in SERIES:
+            return self.graph.node("series", param=value)
+        if kind == "name" and value in WINDOW_FUNCTIONS + ("prev",):
+            return self.parse_call(value)
+        if kind is None:
+            raise RuleSyntaxError("Unexpected end of rule")
+        raise RuleSyntaxError(f"Unexpected {value!r}")
+
+    def parse_call(self, name):
+        self.expect("(")
+        operand = self._num(self.parse_additive(), name)
+        length = 1 if name == "prev" else None
+        if self.peek() == ("symbol", ","):
+            self.take()
+            kind, value = self.take()
+            if kind != "number" or value != int(value) or value < 1:
+                raise RuleSyntaxError(f"{name}() length must be a positive integer")
+            length = int(value)
+        self.expect(")")
+        if length is None:
+            raise RuleSyntaxError(f"{name}() needs a length, e.g. {name}(close, 20)")
+        return self.graph.node(name, (operand,), param=length)
+
+
+def parse_rule(text, graph):
+    """Parse one condition into `graph` and return its root node."""
+    node = _Parser(text, graph).parse()
+    if not node.is_bool:
+        raise RuleSyntaxError(f"Rule {text!r} is a number, not a condition")
+    return node
+
+
+def is_edge_triggered(node):
+    """True if the condition uses crosses_above/crosses_below, i.e. it fires on a single bar."""
+    return node.op in ("crosses_above", "crosses_below") or any(is_edge_triggered(a) for a in node.args)
+
+
+def parse_rules(text):
+    """Split 'entry: ...' / 'exit: ...' lines into a dict."""
+    rules = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, sep, rule = line.partition(":")
+        if not sep or key.strip().lower() not in ("entry", "exit"):
+            raise RuleSyntaxError(f"Expected 'entry: ...' or 'exit: ...', got {line!r}")
+        rules[key.strip().lower()] = rule.strip()
+    if set(rules) != {"entry", "exit"}:
+        raise RuleSyntaxError("Rules need both an 'entry:' and an 'exit:' line")
+    return rules
+
+
+# --- Vectorized evaluation ---
+
+def _shift(values, n):
+    out = np.full(len(values), np.nan if values.dtype.kind == "f" else False, dtype=values.dtype)
+    if n < len(values):
+        out[n:] = values[:len(values) - n]
+    return out
+
+
+def _rolling_mean(values, n):
+    """
+    Rolling mean with the same arithmetic as _Window.mean(): each window is
+    summed left to right and divided by n, and a window of equal values
+    returns that value exactly. Live and backtest SMAs are therefore
+    bit-identical, so comparisons against them give the same signals even
+    on flat, tick-rounded prices (pandas' rolling().mean() keeps a running
+    sum and differs in the last bits).
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if len(values) < n:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(values, n)
+    total = windows[:, 0].copy()
+    flat = np.ones(len(windows), dtype=bool)
+    for j in range(1, n):
+        total += windows[:, j]
+        flat &= windows[:, j] == windows[:, 0]
+    out[n - 1:] = np.where(flat, windows[:, -1], total / n)
+    return out
+
+
+def _evaluate_vectorized(node, args, arrays, length):
+    op = node.op
+    if op == "series":
+        return arrays[node.param]
+    if op == "const":
+        return np.full(length, node.param)
+    if op == "sma":
+        return _rolling_mean(args[0], node.param)
+    if op == "ema":
+        return pd.Series(args[0]).ewm(span=node.param, adjust=False, min_periods=node.param).mean().to_numpy()
+    if op == "highest":
+        return pd.Series(args[0]).rolling(window=node.param).max().to_numpy()
+    if op == "lowest":
+        return pd.Series(args[0]).rolling(window=node.param).min().to_numpy()
+    if op == "prev":
+        return _shift(args[0], node.param)
+    if op in ARITHMETIC:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if op == "+":
+                return args[0] + args[1]
+            if op == "-":
+                return args[0] - args[1]
+            if op == "*":
+                return args[0] * args[1]
+            return np.where(args[1] != 0, args[0] / args[1], np.nan)
+    if op == ">":
+        return args[0] > args[1]
+    if op == "<":
+        return args[0] < args[1]
+    if op == ">=":
+        return args[0] >= args[1]
+    if op == "<=":
+        return args[0] <= args[1]
+    if op == "crosses_above":
+        return (_shift(args[0], 1) <= _shift(args[1], 1)) & (args[0] > args[1])
+    if op == "crosses_below":
+        return (_shift(args[0], 1) >= _shift(args[1], 1)) & (args[0] < args[1])
+    if op == "and":
+        return args[0] & args[1]
+    if op == "or":
+        return args[0] | args[1]
+    if op == "not":
+        return ~args[0]
+    raise ValueError(f"Unknown op {op}")
+
+
+def compile_vectorized(graph, roots):
+    """
+    Return a function mapping { series name: float array } to one boolean
+    array per root. Each graph node is computed exactly once per call.
+    """
+    nodes = graph.nodes
+
+    def evaluate(arrays):
+        length = len(next(iter(arrays.values())))
+        values = [None] * len(nodes)
+        with np.errstate(invalid="ignore"):
+            for node in nodes:
+                values[node.index] = _evaluate_vectorized(
+                    node, [values[a.index] for a in node.args], arrays, length)
+        return [values[root.index] for root in roots]
+
+    return evaluate
+
+
+# --- Incremental evaluation ---
+
+class _Window:
+    """
+    Last n values, counting NaNs and how many of the newest values are equal.
+
+    mean() follows _rolling_mean(): the window is summed again left to
+    right every bar (no running sum whose rounding error builds up), and
+    an all-equal window returns that value exactly.
+    """
+    __slots__ = ("values", "n", "nan_count", "same_count")
+
+    def __init__(self, n):
+        self.values = deque()
+        self.n = n
+        self.nan_count = 0
+        self.same_count = 0
+
+    def push(self, x):
+        if self.values and x == self.values[-1]:
+            self.same_count += 1
+        else:
+            self.same_count = 1
+        self.values.append(x)
+        if math.isnan(x):
+            self.nan_count += 1
+        if len(self.values) > self.n:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.nan_count -= 1
+
+    @property
+    def full(self):
+        return len(self.values) == self.n and self.nan_count == 0
+
+    def mean(self):
+        if self.same_count >= self.n:
+            return self.values[-1]
+        # Plain left-to-right adds, not sum(): that is compensated since Python 3.12
+        total = 0.0
+        for x in self.values:
+            total += x
+        return total / self.n
+
+
+def _incremental_step(node):
+    """Return a closure computing the node's value for one new bar from its args' values."""
+    op = node.op
+    nan = float("nan")
+
+    if op == "series":
+        name = node.param
+        return lambda args, bar: bar[name]
+    if op == "const":
+        value = node.param
+        return lambda args, bar: value
+    if op in ("sma", "highest", "lowest"):
+        window = _Window(node.param)
+        reduce = {"sma": _Window.mean, "highest": lambda w: max(w.values),
+                  "lowest": lambda w: min(w.values)}[op]
+
+        def step(args, bar):
+            window.push(args[0])
+            return reduce(window) if window.full else nan
+        return step
+    if op == "ema":
+        alpha = 2 / (node.param + 1)
+        state = {"ema": None, "count": 0}
+
+        def step(args, bar):
+            x = args[0]
+            if not math.isnan(x):
+                state["ema"] = x if state["ema"] is None else alpha * x + (1 - alpha) * state["ema"]
+                state["count"] += 1
+            return state["ema"] if state["count"] >= node.param else nan
+        return step
+    if op == "prev":
+        history = deque(maxlen=node.param + 1)
+
+        def step(args, bar):
+            history.append(args[0])
+            return history[0] if len(history) == history.maxlen else nan
+        return step
+    if op in ARITHMETIC:
+        def step(args, bar):
+            a, b = args
+            if op == "+":
+                return a + b
+            if op == "-":
+                return a - b
+            if op == "*":
+                return a * b
+            return a / b if b != 0 else nan
+        return step
+    if op in (">", "<", ">=", "<="):
+        compare = {">": lambda a, b: a > b, "<": lambda a, b: a < b,
+                   ">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b}[op]
+        return lambda args, bar: compare(*args)
+    if op in ("crosses_above", "crosses_below"):
+        previous = [nan, nan]
+
+        def step(args, bar):
+            a, b = args
+            if op == "crosses_above":
+                result = previous[0] <= previous[1] and a > b
+            else:
+                result = previous[0] >= previous[1] and a < b
+            previous[0], previous[1] = a, b
+            return result
+        return step
+    if op == "and":
+        return lambda args, bar: args[0] and args[1]
+    if op == "or":
+        return lambda args, bar: args[0] or args[1]
+    if op == "not":
+        return lambda args, bar: not args[0]
+    raise ValueError(f"Unknown op {op}")
+
+
+class IncrementalEvaluator:
+    """Evaluates the graph one bar at a time; every node keeps its own running state."""
+    def __init__(self, graph, roots):
+        self.roots = roots
+        self._nodes = graph.nodes
+        self._steps = [_incremental_step(node) for node in graph.nodes]
+        self._values = [None] * len(graph.nodes)
+
+    def update(self, bar):
+        """`bar` maps series name -> float. Returns one bool per root."""
+        values = self._values
+        for node, step in zip(self._nodes, self._steps):
+            values[node.index] = step([values[a.index] for a in node.args], bar)
+        return [bool(values[root.index]) for root in self.roots]
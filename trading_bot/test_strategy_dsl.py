@@ -0,0 +1,66 @@
+"""
+Live (IncrementalEvaluator) and backtest (compile_vectorized) evaluation of
+the same rules must agree bar for bar, including on tick-rounded prices
+with flat stretches where comparisons against an SMA are exact ties.
+
+Run with:  python -m pytest trading_bot
+"""
+
+import numpy as np
+import pytest
+
+from strategy_dsl import ExpressionGraph, IncrementalEvaluator, compile_vectorized, parse_rule
+
+RULES = [
+    "close < sma(close, 3)",
+    "close > sma(close, 3)",
+    "close >= sma(close, 20)",
+    "close <= sma(close, 7)",
+    "sma(close, 3) crosses_above sma(close, 10)",
+    "sma(close, 5) crosses_below sma(close, 20)",
+    "close < ema(close, 3) and close > ema(close, 9)",
+    "ema(close, 5) crosses_above sma(close, 10)",
+    "close > highest(prev(close), 5) or close < lowest(prev(close), 5)",
+    "(high - low) / close > 0.001",
+]
+
+
+def tick_rounded_bars(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.normal(0, 0.05, n)), 2)
+    for start in range(200, n, 400):
+        close[start:start + 10] = close[start]
+    close[4000:4010] = close[4000]
+    high = np.round(close + rng.uniform(0, 0.1, n), 2)
+    low = np.round(close - rng.uniform(0, 0.1, n), 2)
+    return {"close": close, "high": high, "low": low}
+
+
+def evaluate_both(rules, bars):
+    graph = ExpressionGraph()
+    roots = [parse_rule(rule, graph) for rule in rules]
+    vectorized = [np.asarray(signal, dtype=bool) for signal in compile_vectorized(graph, roots)(bars)]
+
+    evaluator = IncrementalEvaluator(graph, roots)
+    names = list(bars)
+    incremental = np.array([
+        evaluator.update({name: bars[name][i] for name in names}) for i in range(len(bars["close"]))
+    ]).T
+    return vectorized, incremental
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_incremental_matches_vectorized_on_tick_rounded_prices(seed):
+    vectorized, incremental = evaluate_both(RULES, tick_rounded_bars(seed=seed))
+    for rule, expected, actual in zip(RULES, vectorized, incremental):
+        mismatches = np.flatnonzero(expected != actual)
+        assert len(mismatches) == 0, f"{rule!r} differs at bars {mismatches[:10].tolist()}"
+
+
+def test_flat_prices_are_not_below_their_sma():
+    bars = tick_rounded_bars()
+    vectorized, incremental = evaluate_both(["close < sma(close, 3)", "close > sma(close, 3)"], bars)
+    # Bars 4002..4009 have three equal closes in their window, so close == sma
+    flat = slice(4002, 4010)
+    for signal in vectorized + list(incremental):
+        assert not signal[flat].any()
@@ -0,0 +1,119 @@
+"""
+trade_records.py
+
+Compact trade representation used by strategies and Backtester.
+
+Trades are stored in a NumPy structured array (one 41-byte row per trade,
+int64 epoch-ms timestamps, float64 prices/balances) instead of one dict
+per trade. TradeRecord is a lazy dict-like view over one row, so code that
+does trade["action"] or trade["timestamp"].strftime(...) keeps working.
+"""
+
+import numpy as np
+import pandas as pd
+
+BUY = 1
+SELL = -1
+ACTION_NAMES = {BUY: "BUY", SELL: "SELL"}
+
+TRADE_FIELDS = ("action", "price", "timestamp", "balance_before", "balance_after", "amount")
+TRADE_DTYPE = np.dtype([
+    ("action", np.int8),
+    ("price", np.float64),
+    ("timestamp", np.int64),        # epoch milliseconds (UTC)
+    ("balance_before", np.float64),
+    ("balance_after", np.float64),
+    ("amount", np.float64),
+])
+
+
+def close_times_ms(data: pd.DataFrame):
+    """`close_time` column as int64 epoch ms, whether it holds raw ms or datetimes."""
+    close_time = data["close_time"]
+    if pd.api.types.is_datetime64_any_dtype(close_time):
+        return close_time.to_numpy().astype("datetime64[ms]").astype(np.int64)
+    return pd.to_numeric(close_time).to_numpy(dtype=np.int64)
+
+
+class TradeRecord:
+    """Read-only, dict-like view of one trade row."""
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getitem__(self, key):
+        value = self._row[key]
+        if key == "action":
+            return ACTION_NAMES[int(value)]
+        if key == "timestamp":
+            return pd.Timestamp(int(value), unit="ms")
+        return float(value)
+
+    def get(self, key, default=None):
+        return self[key] if key in TRADE_FIELDS else default
+
+    def keys(self):
+        return TRADE_FIELDS
+
+    def to_dict(self):
+        return {key: self[key] for key in TRADE_FIELDS}
+
+    def __repr__(self):
+        return f"TradeRecord({self.to_dict()})"
+
+
+class TradeBatch:
+    """Sequence of trades backed by a TRADE_DTYPE structured array."""
+    __slots__ = ("records",)
+
+    def __init__(self, records=None):
+        self.records = records if records is not None else np.empty(0, dtype=TRADE_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return TradeBatch(self.records[idx])
+        return TradeRecord(self.records[idx])
+
+    def __iter__(self):
+        for row in self.records:
+            yield TradeRecord(row)
+
+    def to_dicts(self):
+        """The old list-of-dicts representation, for callers that still need it."""
+        return [record.to_dict() for record in self]
+
+    def to_frame(self):
+        records = self.records
+        return pd.DataFrame({
+            "action": np.where(records["action"] == BUY, "BUY", "SELL"),
+            "price": records["price"],
+            "timestamp": pd.to_datetime(records["timestamp"], unit="ms"),
+            "balance_before": records["balance_before"],
+            "balance_after": records["balance_after"],
+            "amount": records["amount"],
+        })
+
+
+class TradeBatchBuilder:
+    """Appends trades into a preallocated array that grows by doubling."""
+    __slots__ = ("_records", "_size")
+
+    def __init__(self, capacity=64):
+        self._records = np.empty(capacity, dtype=TRADE_DTYPE)
+        self._size = 0
+
+    def append(self, action, price, timestamp_ms, balance_before, balance_after, amount):
+        if self._size == len(self._records):
+            self._records = np.resize(self._records, max(1, 2 * len(self._records)))
+        self._records[self._size] = (action, price, timestamp_ms, balance_before, balance_after, amount)
+        self._size += 1
+
+    def __len__(self):
+        return self._size
+
+    def build(self):
+        return TradeBatch(self._records[:self._size].copy())
@@ -0,0 +1,94 @@
+"""
+universe_scanner.py
+
+Picks the symbols to trade from one bulk 24h ticker request.
+
+All filters and the ranking are vectorized over a DataFrame of every
+ticker, so scanning the full USDT market costs a single API call and no
+per-symbol kline requests.
+
+Filters (all optional):
+- min_quote_volume: 24h quote volume (USDT)
+- min_volatility / max_volatility: (high - low) / last price
+- max_spread: (ask - bid) / mid price
+- min_trend: 24h price change percent
+
+The survivors are ranked by the average of their volume, volatility and
+trend ranks, best first.
+
+Usage with LiveTradingBot:
+    scanner = UniverseScanner(wrapper, top_n=20)
+    bot = LiveTradingBot(..., symbols=scanner.scan(), scanner=scanner, rescan_interval=3600)
+"""
+
+import numpy as np
+import pandas as pd
+
+# Leveraged / wrapped tokens that look like spot pairs but aren't wanted here
+EXCLUDED_SUFFIXES = ("UPUSDT", "DOWNUSDT", "BULLUSDT", "BEARUSDT")
+STABLECOINS = ("USDC", "BUSD", "TUSD", "FDUSD", "USDP", "DAI")
+
+NUMERIC_COLUMNS = ["lastPrice", "highPrice", "lowPrice", "bidPrice", "askPrice",
+                   "quoteVolume", "priceChangePercent"]
+
+
+class UniverseScanner:
+    def __init__(self, wrapper, quote_asset="USDT", top_n=20, min_quote_volume=10_000_000,
+                 min_volatility=0.02, max_volatility=0.5, max_spread=0.002, min_trend=None):
+        self.wrapper = wrapper
+        self.quote_asset = quote_asset
+        self.top_n = top_n
+        self.min_quote_volume = min_quote_volume
+        self.min_volatility = min_volatility
+        self.max_volatility = max_volatility
+        self.max_spread = max_spread
+        self.min_trend = min_trend
+        self.last_ranking = pd.DataFrame()
+
+    def scan(self, tickers=None):
+        """Return the top_n symbols, best first. `tickers` defaults to a fresh wrapper.get_24h_tickers()."""
+        if tickers is None:
+            tickers = self.wrapper.get_24h_tickers()
+        ranking = self.rank(pd.DataFrame(tickers))
+        self.last_ranking = ranking
+        return ranking["symbol"].head(self.top_n).tolist()
+
+    def rank(self, tickers: pd.DataFrame):
+        if tickers.empty:
+            return pd.DataFrame(columns=["symbol", "score"])
+
+        symbols = tickers["symbol"]
+        base = symbols.str[:-len(self.quote_asset)]
+        df = tickers.loc[
+            symbols.str.endswith(self.quote_asset)
+            & ~symbols.str.endswith(EXCLUDED_SUFFIXES)
+            & ~base.isin(STABLECOINS),
+            ["symbol"] + NUMERIC_COLUMNS
+        ].copy()
+        df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
+
+        last = df["lastPrice"].replace(0, np.nan)
+        mid = ((df["bidPrice"] + df["askPrice"]) / 2).replace(0, np.nan)
+        df["volatility"] = (df["highPrice"] - df["lowPrice"]) / last
+        df["spread"] = (df["askPrice"] - df["bidPrice"]) / mid
+        df["trend"] = df["priceChangePercent"]
+
+        mask = df["volatility"].notna() & df["spread"].notna()
+        if self.min_quote_volume is not None:
+            mask &= df["quoteVolume"] >= self.min_quote_volume
+        if self.min_volatility is not None:
+            mask &= df["volatility"] >= self.min_volatility
+        if self.max_volatility is not None:
+            mask &= df["volatility"] <= self.max_volatility
+        if self.max_spread is not None:
+            mask &= df["spread"] <= self.max_spread
+        if self.min_trend is not None:
+            mask &= df["trend"] >= self.min_trend
+        df = df[mask]
+
+        df["score"] = (
+            df["quoteVolume"].rank(pct=True)
+            + df["volatility"].rank(pct=True)
+            + df["trend"].rank(pct=True)
+        ) / 3
+        return df.sort_values("score", ascending=False).reset_index(drop=True)